@@ -1,7 +1,24 @@
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field, HttpUrl
 
 class EvaluateRequest(BaseModel):
     job_title: str
     cv_id: str
     report_id: str
+    bypass_cache: bool = False
+    callback_url: Optional[HttpUrl] = None
 
+class RetryRequest(BaseModel):
+    restart: bool = False  # discard checkpoints and rerun every stage
+    bypass_cache: bool = False
+    callback_url: Optional[HttpUrl] = None
+
+class BatchItem(BaseModel):
+    cv_id: str
+    report_id: str
+
+class BatchEvaluateRequest(BaseModel):
+    job_title: str
+    items: List[BatchItem] = Field(..., min_length=1)
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    bypass_cache: bool = False
@@ -1,41 +1,274 @@
-import os
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks, HTTPException
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
-from app.api.schemas.schemas import EvaluateRequest
-from app.services.pipeline_service import create_job, run_pipeline, get_job
-from app.utils.file_io import save_upload_bytes, path_by_id
+from fastapi import APIRouter, Depends, UploadFile, File, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.api.schemas.schemas import EvaluateRequest, BatchEvaluateRequest, RetryRequest
+from app.core.job_queue import get_queue, QueueFullError
+from app.services.batch_service import create_batch, get_batch
+from app.services.pipeline_service import ACTIVE_STATUSES, create_job, fail_job, get_job, retry_job
+from app.core.config import settings
+from app.core.events import async_client, job_channel
+from app.core.metrics import EVALUATE_DEDUPED
+from app.services import idempotency_service as idem
+from app.services.job_query_service import InvalidCursorError, export_csv, export_ndjson, list_jobs
+from app.services.upload_service import save_upload_stream, path_by_id, UploadTooLargeError
+from app.services.webhook_service import UnsafeWebhookError, check_url
 
 router = APIRouter(prefix="/evaluate", tags=["Evaluate"])
 
 
+def _callback(url: Optional[Any]) -> Optional[str]:
+    # rejected up front; the worker checks resolved addresses again before each POST
+    if not url:
+        return None
+    try:
+        check_url(str(url))
+    except UnsafeWebhookError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return str(url)
+
+
 @router.post("/upload")
 async def upload(cv: UploadFile = File(...), report: UploadFile = File(...)):
     try:
-        cv_bytes = await cv.read()
-        report_bytes = await report.read()
-        cv_id = save_upload_bytes(cv.filename, cv_bytes)
-        report_id = save_upload_bytes(report.filename, report_bytes)
+        cv_id, cv_size = await save_upload_stream(cv)
+        budget = min(settings.MAX_UPLOAD_FILE_BYTES, settings.MAX_UPLOAD_REQUEST_BYTES - cv_size)
+        report_id, _ = await save_upload_stream(report, max_bytes=budget)
         return {"cv_id": cv_id, "report_id": report_id}
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Upload failed: {e}")
 
 
 @router.post("", summary="Create evaluation job")
-def evaluate(req: EvaluateRequest, bg: BackgroundTasks):
+def evaluate(req: EvaluateRequest, idempotency_key: Optional[str] = Header(None, max_length=255)):
+    """
+    A request with a known Idempotency-Key, or (unless bypass_cache is set)
+    the same job_title/cv_id/report_id/callback_url as a queued, running or
+    finished job, gets that job back with "deduplicated": true instead of a
+    new evaluation. A different callback_url counts as a different request,
+    so every caller that asked for a webhook gets one.
+    Failed jobs are not reused by content; use /retry for those.
+    """
+    callback_url = _callback(req.callback_url)
     try:
         _ = path_by_id(req.cv_id)
         _ = path_by_id(req.report_id)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-    job_id = create_job(req.job_title, req.cv_id, req.report_id)
-    bg.add_task(run_pipeline, job_id, req.job_title, req.cv_id, req.report_id)
+    job_id = str(uuid.uuid4())
+    fp = idem.fingerprint(req.job_title, req.cv_id, req.report_id, callback_url)
+    key = None
+    if idempotency_key or (settings.DEDUP_ENABLED and not req.bypass_cache):
+        key = idem.dedup_key(fp, idempotency_key)
+        seen: Dict[str, Dict[str, Any]] = {}
+
+        def reusable(existing_id: str) -> Optional[bool]:
+            seen[existing_id] = get_job(existing_id)
+            if not seen[existing_id]:
+                return None
+            return bool(idempotency_key) or seen[existing_id]["status"] != "failed"
+
+        try:
+            existing = idem.reserve(key, job_id, fp, reusable, check_fp=bool(idempotency_key))
+        except idem.IdempotencyConflictError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if existing:
+            EVALUATE_DEDUPED.labels(kind="idempotency_key" if idempotency_key else "content").inc()
+            # a pending holder has not inserted its row yet
+            current = seen.get(existing) or get_job(existing) or {"id": existing, "status": "queued"}
+            return {**current, "deduplicated": True}
+
+    # after the dedup lookup, so a full queue never hides an existing result
+    queue = get_queue()
+    try:
+        queue.ensure_capacity()
+    except QueueFullError as e:
+        if key:
+            idem.release(key, job_id, fp)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    create_job(req.job_title, req.cv_id, req.report_id, job_id=job_id)
+    if key:
+        idem.commit(key, job_id, fp)
+    try:
+        queue.enqueue(job_id, {
+            "job_title": req.job_title,
+            "cv_id": req.cv_id,
+            "report_id": req.report_id,
+            "use_cache": not req.bypass_cache,
+            "callback_url": callback_url,
+        })
+    except QueueFullError as e:
+        fail_job(job_id, str(e))
+        if key:
+            idem.release(key, job_id, fp)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
     return {"id": job_id, "status": "queued"}
 
 
+@router.post("/retry/{job_id}", summary="Retry a failed job, resuming after its last finished stage")
+def retry(job_id: str, req: Optional[RetryRequest] = None):
+    req = req or RetryRequest()
+    callback_url = _callback(req.callback_url)
+    current = get_job(job_id)
+    if not current:
+        raise HTTPException(status_code=404, detail="job not found")
+    if current["status"] != "failed":
+        raise HTTPException(status_code=409, detail=f"job is {current['status']}; only failed jobs can be retried")
+
+    queue = get_queue()
+    try:
+        queue.ensure_capacity()
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    job = retry_job(job_id, restart=req.restart)
+    if job is None:
+        raise HTTPException(status_code=409, detail="job is no longer in failed state")
+    try:
+        queue.enqueue(job_id, {
+            **job,
+            "use_cache": not req.bypass_cache,
+            "callback_url": callback_url,
+            "retry": True,
+        }, force=True)
+    except QueueFullError as e:
+        fail_job(job_id, str(e))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return {"id": job_id, "status": "queued", "restart": req.restart}
+
+
+@router.post("/batch", summary="Create batch evaluation (one job title, many candidates)")
+def evaluate_batch(req: BatchEvaluateRequest):
+    if len(req.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"batch exceeds {settings.BATCH_MAX_ITEMS} items")
+
+    missing = []
+    for it in req.items:
+        for fid in (it.cv_id, it.report_id):
+            try:
+                path_by_id(fid)
+            except FileNotFoundError:
+                missing.append(fid)
+    if missing:
+        raise HTTPException(status_code=404, detail={"missing_file_ids": sorted(set(missing))})
+
+    try:
+        get_queue().ensure_capacity()
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    return create_batch(
+        req.job_title,
+        [it.model_dump() for it in req.items],
+        max_concurrency=req.max_concurrency,
+        use_cache=not req.bypass_cache,
+    )
+
+
+@router.get("/batch/{batch_id}", summary="Get batch progress and ranked results")
+def batch_result(batch_id: str, limit: int = Query(50, ge=1, le=1000)):
+    resp = get_batch(batch_id, limit=limit)
+    if not resp:
+        raise HTTPException(status_code=404, detail="batch not found")
+    return resp
+
+
 @router.get("/result/{job_id}", summary="Get job status/result")
 def result(job_id: str):
     resp = get_job(job_id)
     if not resp:
         raise HTTPException(status_code=404, detail="job not found")
     return resp
+
+
+def _job_filters(
+    job_title: Optional[str] = None,
+    status: Optional[List[str]] = Query(None),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: str = Query("created_at", pattern="^(created_at|cv_match_rate|project_score)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+) -> Dict[str, Any]:
+    return dict(
+        job_title=job_title, status=status, created_from=created_from, created_to=created_to,
+        sort=sort, order=order,
+    )
+
+
+@router.get("/jobs", summary="List jobs (filter, sort by score, keyset pagination)")
+def jobs(
+    filters: Dict[str, Any] = Depends(_job_filters),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+):
+    try:
+        return list_jobs(**filters, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/jobs/export", summary="Stream matching jobs with full results as NDJSON or CSV")
+def jobs_export(
+    filters: Dict[str, Any] = Depends(_job_filters),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    if format == "csv":
+        body, media_type = export_csv(**filters), "text/csv"
+    else:
+        body, media_type = export_ndjson(**filters), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="jobs.{format}"'},
+    )
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event.get('status', 'message')}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.get("/stream/{job_id}", summary="Stream job status changes (Server-Sent Events)")
+async def stream(job_id: str):
+    pubsub = async_client().pubsub()
+    # subscribe before reading the current state so no transition can slip in between
+    await pubsub.subscribe(job_channel(job_id))
+    current = await asyncio.to_thread(get_job, job_id)
+    if not current:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        raise HTTPException(status_code=404, detail="job not found")
+
+    async def events():
+        try:
+            yield _sse(current)
+            if current["status"] not in ACTIVE_STATUSES:
+                return
+            while True:
+                msg = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=settings.SSE_KEEPALIVE_SECONDS
+                )
+                if msg is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                event = json.loads(msg["data"])
+                yield _sse(event)
+                if event.get("status") not in ACTIVE_STATUSES:
+                    return
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,5 +1,8 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core import embedding_client, llm_client
 from app.core.config import settings
+from app.core.llm_cache import llm_cache
 
 router = APIRouter()
 
@@ -11,4 +14,14 @@ def health():
         "llm_model": settings.GEMINI_MODEL,
         "embed_model": settings.EMBEDDING_MODEL,
         "index": settings.INDEX_NAME,
+        "llm": llm_client.stats(),
+        "llm_cache": llm_cache.stats(),
+        "embed_batcher": embedding_client.batcher_stats(),
     }
+
+@router.get("/ready")
+def ready():
+    loaded = embedding_client.is_ready()
+    ok = loaded or not settings.EMBEDDING_WARMUP_ON_STARTUP
+    body = {"ready": ok, "embedder_loaded": loaded, "embedder_load_seconds": embedding_client.load_seconds()}
+    return JSONResponse(body, status_code=200 if ok else 503)
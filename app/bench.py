@@ -0,0 +1,335 @@
+"""
+Load/latency benchmark for the upload -> evaluate -> worker pipeline.
+
+Everything external is replaced so the numbers measure our own code paths:
+Gemini by the fake LLM provider (latency set with --llm-latency-ms), the
+embedding model by a small hashing embedder, Redis by fakeredis (with Lua),
+the vector indexes by the in-memory retriever, and Postgres by a throwaway
+SQLite file.
+
+    pip install "fakeredis[lua]"
+    python -m app.bench --jobs 200 --concurrency 8 --llm-latency-ms 300
+    python -m app.bench --baseline infra/bench/baseline.json            # CI gate
+    python -m app.bench --baseline infra/bench/baseline.json --update-baseline
+
+Traffic can be replayed from a JSONL file (--traffic) whose lines carry
+job_title plus cv_text/report_text (or cv_path/report_path); otherwise
+synthetic candidates are generated. Exit status is 1 if any metric regresses
+by more than --tolerance against the baseline.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+TERMINAL = ("completed", "screened_out", "failed")
+STAGES = ("cv_doc", "report_doc", "ctx", "cv_json", "proj_json", "final_json")
+HIST_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _configure_env(args: argparse.Namespace, workdir: str) -> None:
+    # must run before any app module is imported: settings are read at import time
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "GROUND_DIR": os.path.join(workdir, "ground_truth"),
+        "RETRIEVER_BACKEND": "memory",
+        "RETRIEVER_SNAPSHOT_DIR": os.path.join(workdir, "index_snapshot"),
+        "LLM_PROVIDER": "fake",
+        "LLM_FAKE_LATENCY_MS": str(args.llm_latency_ms),
+        "LLM_FAKE_JITTER_MS": str(args.llm_jitter_ms),
+        "LLM_FAKE_FAILURE_RATE": str(args.llm_failure_rate),
+        "LLM_RATE_PER_SEC": "0",
+        "LLM_BACKOFF_BASE": "0.05",
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        "EMBEDDING_WARMUP_ON_STARTUP": "false",
+        "TOKENIZER_MODEL": "approx",
+        "LOG_LEVEL": "WARNING",
+        "WORKER_METRICS_PORT": "0",
+        "WORKER_CONCURRENCY": str(args.concurrency),
+        "QUEUE_MAX_DEPTH": "0",
+        "QUEUE_POLL_INTERVAL": "0.01",
+        "COMPACTION_INTERVAL": "0",
+        "PIPELINE_MODE": args.pipeline_mode,
+        "TRIAGE_ENABLED": "false" if args.triage_threshold is None else "true",
+        "TRIAGE_THRESHOLD": str(args.triage_threshold or 0.0),
+    })
+
+
+# ---------- stubs ----------
+def _install_stubs() -> None:
+    import fakeredis
+
+    from app.core import embedding_client, redis_client
+    from app.testing import HashEmbedder
+
+    redis_client._r = fakeredis.FakeRedis()
+    embedding_client._model = HashEmbedder()
+    embedding_client._load_seconds = 0.0
+
+
+# ---------- traffic ----------
+_SKILLS = "python fastapi django postgres redis kafka docker kubernetes aws gcp llm rag prompting testing ci".split()
+_FILLER = "collaborated with stakeholders delivered features on time improved reliability and mentored peers".split()
+
+
+def _synthetic_doc(rnd: random.Random, kind: str, paragraphs: int) -> str:
+    parts = [f"{kind.upper()} OF CANDIDATE {rnd.randint(1000, 9999)}"]
+    for p in range(paragraphs):
+        parts.append(f"SECTION {p + 1}")
+        words = [rnd.choice(_SKILLS if rnd.random() < 0.3 else _FILLER) for _ in range(rnd.randint(60, 180))]
+        parts.append(" ".join(words) + ".")
+    return "\n\n".join(parts)
+
+
+def load_traffic(path: Optional[str], jobs: int, seed: int) -> List[Dict[str, str]]:
+    if path:
+        items = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                for kind in ("cv", "report"):
+                    if f"{kind}_text" not in row and f"{kind}_path" in row:
+                        with open(row[f"{kind}_path"], "r", encoding="utf-8", errors="ignore") as fh:
+                            row[f"{kind}_text"] = fh.read()
+                items.append({
+                    "job_title": row.get("job_title", "Backend Engineer"),
+                    "cv_text": row["cv_text"],
+                    "report_text": row["report_text"],
+                })
+        return (items * (jobs // max(1, len(items)) + 1))[:jobs] if jobs else items
+    rnd = random.Random(seed)
+    titles = ["Backend Engineer", "Product Engineer (Backend)", "AI Engineer", "Platform Engineer"]
+    return [
+        {
+            "job_title": rnd.choice(titles),
+            "cv_text": _synthetic_doc(rnd, "cv", rnd.randint(3, 8)),
+            "report_text": _synthetic_doc(rnd, "report", rnd.randint(4, 20)),
+        }
+        for _ in range(jobs)
+    ]
+
+
+# ---------- stats ----------
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(p / 100.0 * (len(values) - 1)))))
+    return round(values[idx], 2)
+
+
+def _summary(values_ms: List[float]) -> Dict[str, Any]:
+    hist = {f"<={b}": 0 for b in HIST_BUCKETS_MS}
+    hist["inf"] = 0
+    for v in values_ms:
+        for b in HIST_BUCKETS_MS:
+            if v <= b:
+                hist[f"<={b}"] += 1
+                break
+        else:
+            hist["inf"] += 1
+    return {
+        "count": len(values_ms),
+        "mean": round(sum(values_ms) / len(values_ms), 2) if values_ms else 0.0,
+        "p50": _pct(values_ms, 50),
+        "p95": _pct(values_ms, 95),
+        "p99": _pct(values_ms, 99),
+        "max": round(max(values_ms), 2) if values_ms else 0.0,
+        "histogram": hist,
+    }
+
+
+# ---------- run ----------
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="ai-screening-bench-")
+    _configure_env(args, workdir)
+    tracemalloc.start()
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select
+
+    from app.core.job_queue import get_queue
+    from app.db.models import JobResult
+    from app.db.session import engine, init_db
+    from app.main import create_app
+    from app.worker import Worker
+
+    _install_stubs()
+    init_db()
+    traffic = load_traffic(args.traffic, args.jobs, args.seed)
+
+    upload_ms: List[float] = []
+    evaluate_ms: List[float] = []
+    job_ids: List[str] = []
+    with TestClient(create_app()) as client:
+        for item in traffic:
+            files = {
+                "cv": ("cv.txt", item["cv_text"].encode("utf-8"), "text/plain"),
+                "report": ("report.txt", item["report_text"].encode("utf-8"), "text/plain"),
+            }
+            t0 = time.perf_counter()
+            resp = client.post("/api/v1/evaluate/upload", files=files)
+            upload_ms.append(1000 * (time.perf_counter() - t0))
+            resp.raise_for_status()
+            ids = resp.json()
+
+            t0 = time.perf_counter()
+            resp = client.post("/api/v1/evaluate", json={"job_title": item["job_title"], **ids})
+            evaluate_ms.append(1000 * (time.perf_counter() - t0))
+            resp.raise_for_status()
+            job_ids.append(resp.json()["id"])
+
+    worker = Worker(get_queue(), concurrency=args.concurrency)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    t0 = time.perf_counter()
+    thread.start()
+    pending = set(job_ids)
+    deadline = time.monotonic() + args.timeout
+    while pending and time.monotonic() < deadline:
+        time.sleep(0.05)
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(JobResult.id).where(JobResult.id.in_(list(pending)), JobResult.status.in_(TERMINAL))
+            ).all()
+        pending.difference_update(r.id for r in rows)
+    wall = time.perf_counter() - t0
+    worker.stop.set()
+    thread.join(timeout=10)
+
+    cols = (JobResult.status, JobResult.stage_metrics, JobResult.input_tokens, JobResult.output_tokens,
+            JobResult.created_at, JobResult.updated_at)
+    with engine.connect() as conn:
+        rows = conn.execute(select(*cols).where(JobResult.id.in_(job_ids))).all()
+
+    stage_ms: Dict[str, List[float]] = {s: [] for s in STAGES}
+    for r in rows:
+        for stage, m in json.loads(r.stage_metrics or "{}").items():
+            if "ms" in m:
+                stage_ms.setdefault(stage, []).append(m["ms"])
+    done = [r for r in rows if r.status in TERMINAL]
+    completed = sum(1 for r in rows if r.status == "completed")
+    screened = sum(1 for r in rows if r.status == "screened_out")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "config": {
+            "jobs": len(job_ids),
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_jitter_ms": args.llm_jitter_ms,
+            "llm_failure_rate": args.llm_failure_rate,
+            "llm_cache": args.llm_cache,
+            "pipeline_mode": args.pipeline_mode,
+            "triage_threshold": args.triage_threshold,
+        },
+        "throughput": {
+            "wall_seconds": round(wall, 3),
+            "jobs_per_sec": round(len(done) / wall, 3) if wall else 0.0,
+            "completed": completed,
+            "screened_out": screened,
+            "failed": len(done) - completed - screened,
+            "unfinished": len(pending),
+        },
+        "latency_ms": {
+            "upload": _summary(upload_ms),
+            "evaluate": _summary(evaluate_ms),
+            "stages": {s: _summary(v) for s, v in stage_ms.items()},
+        },
+        "tokens": {
+            "input_total": sum(r.input_tokens or 0 for r in rows),
+            "output_total": sum(r.output_tokens or 0 for r in rows),
+        },
+        "memory": {
+            "python_peak_mb": round(peak / 1e6, 2),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        },
+    }
+
+
+# ---------- regression gate ----------
+def _gate_metrics(report: Dict[str, Any]) -> Dict[str, Tuple[float, str]]:
+    """metric -> (value, direction); 'higher' means bigger is better"""
+    out = {"throughput.jobs_per_sec": (report["throughput"]["jobs_per_sec"], "higher")}
+    for name in ("upload", "evaluate"):
+        out[f"latency_ms.{name}.p95"] = (report["latency_ms"][name]["p95"], "lower")
+    for stage, s in report["latency_ms"]["stages"].items():
+        out[f"latency_ms.stages.{stage}.p95"] = (s["p95"], "lower")
+    out["memory.python_peak_mb"] = (report["memory"]["python_peak_mb"], "lower")
+    return out
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, floor_ms: float) -> List[str]:
+    regressions = []
+    if report["throughput"]["failed"] + report["throughput"]["unfinished"] > \
+            baseline["throughput"]["failed"] + baseline["throughput"]["unfinished"]:
+        regressions.append("more failed/unfinished jobs than baseline")
+    current, base = _gate_metrics(report), _gate_metrics(baseline)
+    for name, (value, direction) in current.items():
+        if name not in base:
+            continue
+        ref = base[name][0]
+        if direction == "higher" and value < ref * (1 - tolerance):
+            regressions.append(f"{name}: {value} < {ref} (-{tolerance:.0%})")
+        # tiny latencies are mostly noise; only gate ones above the floor
+        if direction == "lower" and value > ref * (1 + tolerance) and (value > floor_ms or "memory" in name):
+            regressions.append(f"{name}: {value} > {ref} (+{tolerance:.0%})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end load/latency benchmark with stubbed LLM and embedder.")
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache on")
+    parser.add_argument("--pipeline-mode", choices=("staged", "combined"), default="staged")
+    parser.add_argument("--triage-threshold", type=float, help="enable embedding triage with this threshold")
+    parser.add_argument("--traffic", help="JSONL with job_title + cv_text/report_text (or *_path) per line")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--baseline", help="baseline report to compare against")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--latency-floor-ms", type=float, default=50.0)
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    if args.baseline and args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.latency_floor_ms)
+        if regressions:
+            print("❌ performance regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            return 1
+        print("✅ no regressions against baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
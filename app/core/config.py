@@ -6,6 +6,9 @@ from pydantic import field_validator
 
 class Settings(BaseSettings):
     APP_NAME: str = "AI Screening Service"
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # json | text
+    WORKER_METRICS_PORT: int = 9101  # prometheus endpoint of each worker (+i when forked); 0 disables
     API_V1_STR: str = "/api/v1"
     SERVER_HOST: str = "0.0.0.0"
     SERVER_PORT: int = 8004
@@ -13,10 +16,95 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: str = ""
     GEMINI_MODEL: str = "gemini-2.5-flash"
     EMBEDDING_MODEL: str = "BAAI/bge-m3"
+    EMBEDDING_DEVICE: str = "cpu"
+    EMBEDDING_BACKEND: str = "torch"  # torch | onnx | openvino
+    EMBEDDING_ONNX_FILE: str = ""     # e.g. onnx/model_qint8_avx512_vnni.onnx
+    EMBEDDING_QUANTIZE_INT8: bool = False
+    EMBEDDING_WARMUP_ON_STARTUP: bool = True
+    TOKENIZER_MODEL: str = ""  # defaults to EMBEDDING_MODEL's tokenizer
+    EMBED_BATCHING_ENABLED: bool = True
+    EMBED_BATCH_MAX_SIZE: int = 32
+    EMBED_BATCH_MAX_WAIT_MS: float = 5.0
 
     REDIS_URL: str = "redis://localhost:6379/0"
     INDEX_NAME: str = "gt_idx"
     DOC_PREFIX: str = "gt:"
+    RETRIEVER_BACKEND: str = "redis"  # redis | memory
+    RETRIEVER_SNAPSHOT_DIR: str = "./data/index_snapshot"
+    RETRIEVER_RELOAD_INTERVAL: float = 5.0
+    RETRIEVER_CANDIDATE_MAX_DOCS: int = 256
+    CAND_INDEX_NAME: str = "cand_idx"
+    CAND_DOC_PREFIX: str = "cand:"
+    CAND_CHUNK_TTL: int = 7 * 24 * 3600
+    CAND_CHUNK_CHARS: int = 800
+    CAND_TOP_K: int = 8
+    CAND_CTX_TOKEN_BUDGET: int = 1500
+
+    # per-section token budgets for prompt assembly
+    PROMPT_BUDGET_JD: int = 800
+    PROMPT_BUDGET_BRIEF: int = 800
+    PROMPT_BUDGET_RUBRIC: int = 600
+    PROMPT_BUDGET_STAGE_JSON: int = 400
+
+    # staged: cv + project calls in parallel, then a summary call; combined: one structured call
+    PIPELINE_MODE: str = "staged"
+
+    # embedding triage before any LLM call: mean over the top JD chunks of the
+    # best cosine similarity of any CV chunk; below the threshold -> screened_out
+    TRIAGE_ENABLED: bool = False
+    TRIAGE_THRESHOLD: float = 0.25
+    TRIAGE_JD_K: int = 3
+
+    QUEUE_NAME: str = "eval_jobs"
+    QUEUE_MAX_DEPTH: int = 1000
+    QUEUE_VISIBILITY_TIMEOUT: int = 300
+    QUEUE_MAX_ATTEMPTS: int = 3
+    QUEUE_POLL_INTERVAL: float = 0.5
+    WORKER_CONCURRENCY: int = 4
+    WORKER_PROCESSES: int = 1
+    BATCH_MAX_ITEMS: int = 1000
+    BATCH_DEFAULT_CONCURRENCY: int = 8
+    BATCH_CONTEXT_TTL: int = 24 * 3600
+    # duplicate POST /evaluate (same Idempotency-Key, or same title/cv/report) -> existing job
+    DEDUP_ENABLED: bool = True
+    IDEMPOTENCY_TTL: int = 24 * 3600
+
+    EVENTS_CHANNEL_PREFIX: str = "job_events:"
+    SSE_KEEPALIVE_SECONDS: int = 15
+    WEBHOOK_TIMEOUT: float = 10.0
+    WEBHOOK_MAX_ATTEMPTS: int = 5
+    WEBHOOK_BACKOFF_BASE: float = 1.0
+    WEBHOOK_SECRET: str = ""
+    WEBHOOK_WORKERS: int = 4
+    # callback_url guard: comma-separated schemes, and hosts ("hooks.example.com",
+    # ".example.com" for subdomains; empty allows any host). Hosts resolving to
+    # private, loopback, link-local or other non-public addresses are refused
+    # unless WEBHOOK_ALLOW_PRIVATE is set.
+    WEBHOOK_ALLOWED_SCHEMES: str = "https,http"
+    WEBHOOK_ALLOWED_HOSTS: str = ""
+    WEBHOOK_ALLOW_PRIVATE: bool = False
+
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PREFIX: str = "llmcache:"
+    LLM_CACHE_TTL: int = 7 * 24 * 3600
+    LLM_CACHE_LOCAL_MAX_ENTRIES: int = 512
+    LLM_CACHE_REDIS_MAX_ENTRIES: int = 50000
+
+    LLM_PROVIDER: str = "gemini"          # gemini | fake
+    LLM_TIMEOUT: float = 30.0             # per attempt
+    LLM_DEADLINE: float = 90.0            # per call, across retries and re-asks
+    LLM_MAX_ATTEMPTS: int = 4
+    LLM_BACKOFF_BASE: float = 0.5
+    LLM_BACKOFF_MAX: float = 8.0
+    LLM_JSON_REASKS: int = 1
+    LLM_RATE_PER_SEC: float = 5.0         # shared across all workers; 0 disables
+    LLM_RATE_BURST: int = 10
+    LLM_RATE_KEY: str = "llm:ratelimit"
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_COOLDOWN: float = 30.0
+    LLM_FAKE_LATENCY_MS: float = 800.0
+    LLM_FAKE_JITTER_MS: float = 200.0
+    LLM_FAKE_FAILURE_RATE: float = 0.0
 
     POSTGRES_USER: str = "admin"
     POSTGRES_PASSWORD: str = "admin.admin"
@@ -25,9 +113,28 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int = 5432
 
     DATABASE_URL: Optional[str] = None
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
 
     UPLOAD_DIR: str = "./data/uploads"
     GROUND_DIR: str = "./data/ground_truth"
+    INGEST_CHUNK_CHARS: int = 1200
+    INGEST_CHUNK_OVERLAP: int = 150
+    INGEST_EMBED_BATCH: int = 256
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    MAX_UPLOAD_FILE_BYTES: int = 20 * 1024 * 1024
+    MAX_UPLOAD_REQUEST_BYTES: int = 40 * 1024 * 1024
+
+    # retention/compaction, run by one worker every COMPACTION_INTERVAL seconds (0 disables)
+    RETENTION_DAYS: int = 90              # finished jobs older than this move to job_results_archive; 0 keeps them
+    ARCHIVE_RETENTION_DAYS: int = 0       # archived jobs older than this are deleted; 0 keeps them
+    UPLOAD_RETENTION_DAYS: int = 0        # uploads no live job references are deleted after this; 0 keeps them
+    UPLOAD_ORPHAN_GRACE: int = 24 * 3600  # unregistered files / temp files younger than this are left alone
+    COMPACTION_INTERVAL: int = 3600
+    COMPACTION_BATCH_SIZE: int = 1000
+    COMPACTION_BATCH_PAUSE: float = 0.05
 
     BACKEND_CORS_ORIGINS: List[str] = []
 
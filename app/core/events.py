@@ -0,0 +1,32 @@
+import json
+from typing import Any, Dict, Optional
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+
+def job_channel(job_id: str) -> str:
+    return f"{settings.EVENTS_CHANNEL_PREFIX}{job_id}"
+
+
+def publish_job_event(job_id: str, event: Dict[str, Any]) -> None:
+    """Fan a job status change out to every API replica; best effort, never raises."""
+    try:
+        get_redis().publish(job_channel(job_id), json.dumps(event, ensure_ascii=False, default=str))
+    except Exception as e:
+        log.warning("publish failed for job %s: %s", job_id, e)
+
+
+_sub: Optional[aioredis.Redis] = None
+
+
+def async_client() -> aioredis.Redis:
+    global _sub
+    if _sub is None:
+        _sub = aioredis.from_url(settings.REDIS_URL, socket_connect_timeout=2)
+    return _sub
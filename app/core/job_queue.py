@@ -0,0 +1,168 @@
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+
+class QueueFullError(Exception):
+    pass
+
+
+# ---------- keys ----------
+# {q}:pending     LIST  job ids waiting for a worker (LPUSH in, RPOP out)
+# {q}:processing  ZSET  job id -> lease deadline (unix seconds)
+# {q}:payload     HASH  job id -> json payload
+# {q}:attempts    HASH  job id -> number of claims so far
+# {q}:dead        LIST  job ids that exceeded QUEUE_MAX_ATTEMPTS
+def _keys(name: str) -> Dict[str, str]:
+    return {
+        "pending": f"{name}:pending",
+        "processing": f"{name}:processing",
+        "payload": f"{name}:payload",
+        "attempts": f"{name}:attempts",
+        "dead": f"{name}:dead",
+    }
+
+
+# ---------- lua (atomic claim / reap / enqueue) ----------
+_ENQUEUE_LUA = """
+local depth = redis.call('LLEN', KEYS[1]) + redis.call('ZCARD', KEYS[2])
+local max_depth = tonumber(ARGV[3])
+if max_depth > 0 and depth >= max_depth then
+  return 0
+end
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[2])
+redis.call('LPUSH', KEYS[1], ARGV[1])
+return 1
+"""
+
+_CLAIM_LUA = """
+local job_id = redis.call('RPOP', KEYS[1])
+if not job_id then
+  return false
+end
+redis.call('ZADD', KEYS[2], ARGV[1], job_id)
+local attempts = redis.call('HINCRBY', KEYS[4], job_id, 1)
+local payload = redis.call('HGET', KEYS[3], job_id)
+return {job_id, payload or '', attempts}
+"""
+
+_REAP_LUA = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, 100)
+local dead = {}
+for _, job_id in ipairs(expired) do
+  redis.call('ZREM', KEYS[2], job_id)
+  local attempts = tonumber(redis.call('HGET', KEYS[4], job_id) or '0')
+  if attempts >= tonumber(ARGV[2]) then
+    redis.call('LPUSH', KEYS[5], job_id)
+    table.insert(dead, job_id)
+    table.insert(dead, redis.call('HGET', KEYS[3], job_id) or '')
+    redis.call('HDEL', KEYS[3], job_id)
+    redis.call('HDEL', KEYS[4], job_id)
+  else
+    redis.call('RPUSH', KEYS[1], job_id)
+  end
+end
+return dead
+"""
+
+
+class JobQueue:
+    """
+    Reliable FIFO on plain Redis. A claimed job holds a lease in the processing
+    set; if the worker does not ack (or extend) before the lease expires, the
+    reaper pushes it back to the head of the pending list.
+    """
+
+    def __init__(self, client: redis.Redis, name: str = settings.QUEUE_NAME):
+        self.r = client
+        self.name = name
+        self.k = _keys(name)
+        self._enqueue = self.r.register_script(_ENQUEUE_LUA)
+        self._claim = self.r.register_script(_CLAIM_LUA)
+        self._reap = self.r.register_script(_REAP_LUA)
+
+    def depth(self) -> int:
+        pipe = self.r.pipeline(transaction=False)
+        pipe.llen(self.k["pending"])
+        pipe.zcard(self.k["processing"])
+        pending, processing = pipe.execute()
+        return int(pending) + int(processing)
+
+    def ensure_capacity(self) -> None:
+        if settings.QUEUE_MAX_DEPTH > 0 and self.depth() >= settings.QUEUE_MAX_DEPTH:
+            raise QueueFullError(f"queue '{self.name}' is full ({settings.QUEUE_MAX_DEPTH} jobs)")
+
+    def enqueue(self, job_id: str, payload: Dict[str, Any], force: bool = False) -> None:
+        """force skips the depth check (used for work that was already admitted, e.g. batch releases)"""
+        ok = self._enqueue(
+            keys=[self.k["pending"], self.k["processing"], self.k["payload"]],
+            args=[job_id, json.dumps(payload), 0 if force else settings.QUEUE_MAX_DEPTH],
+        )
+        if not ok:
+            raise QueueFullError(f"queue '{self.name}' is full ({settings.QUEUE_MAX_DEPTH} jobs)")
+
+    def claim(self, visibility_timeout: Optional[int] = None) -> Optional[Tuple[str, Dict[str, Any], int]]:
+        vt = visibility_timeout or settings.QUEUE_VISIBILITY_TIMEOUT
+        res = self._claim(
+            keys=[self.k["pending"], self.k["processing"], self.k["payload"], self.k["attempts"]],
+            args=[time.time() + vt],
+        )
+        if not res:
+            return None
+        job_id, raw, attempts = res
+        job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+        payload = json.loads(raw) if raw else {}
+        return job_id, payload, int(attempts)
+
+    def extend(self, job_ids: List[str], visibility_timeout: Optional[int] = None) -> None:
+        if not job_ids:
+            return
+        vt = visibility_timeout or settings.QUEUE_VISIBILITY_TIMEOUT
+        deadline = time.time() + vt
+        self.r.zadd(self.k["processing"], {jid: deadline for jid in job_ids}, xx=True)
+
+    def ack(self, job_id: str) -> None:
+        pipe = self.r.pipeline(transaction=True)
+        pipe.zrem(self.k["processing"], job_id)
+        pipe.hdel(self.k["payload"], job_id)
+        pipe.hdel(self.k["attempts"], job_id)
+        pipe.execute()
+
+    def reap(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Re-queue expired leases; returns (id, payload) of jobs that ran out of attempts."""
+        dead = self._reap(
+            keys=[
+                self.k["pending"],
+                self.k["processing"],
+                self.k["payload"],
+                self.k["attempts"],
+                self.k["dead"],
+            ],
+            args=[time.time(), settings.QUEUE_MAX_ATTEMPTS],
+        )
+        dead = [d.decode() if isinstance(d, bytes) else d for d in dead or []]
+        return [(dead[i], json.loads(dead[i + 1]) if dead[i + 1] else {}) for i in range(0, len(dead), 2)]
+
+    def stats(self) -> Dict[str, int]:
+        pipe = self.r.pipeline(transaction=False)
+        pipe.llen(self.k["pending"])
+        pipe.zcard(self.k["processing"])
+        pipe.llen(self.k["dead"])
+        pending, processing, dead = pipe.execute()
+        return {"pending": int(pending), "processing": int(processing), "dead": int(dead)}
+
+
+# ---------- default queue (lazy) ----------
+_queue: Optional[JobQueue] = None
+
+
+def get_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(get_redis())
+    return _queue
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+
+def cache_key(model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    h = hashlib.sha256()
+    h.update(prompt.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(params or {}, sort_keys=True, default=str).encode("utf-8"))
+    return f"{settings.LLM_CACHE_PREFIX}{model}:{h.hexdigest()}"
+
+
+class LLMCache:
+    """
+    Two-level cache for parsed LLM JSON: a small in-process LRU in front of
+    Redis. Both levels honour the same TTL; Redis is additionally capped at
+    LLM_CACHE_REDIS_MAX_ENTRIES by evicting the oldest writes. Redis errors are
+    swallowed so a cache outage never fails an evaluation.
+    """
+
+    def __init__(
+        self,
+        ttl: int = settings.LLM_CACHE_TTL,
+        local_max: int = settings.LLM_CACHE_LOCAL_MAX_ENTRIES,
+        redis_max: int = settings.LLM_CACHE_REDIS_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.local_max = local_max
+        self.redis_max = redis_max
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"local_hits": 0, "redis_hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+    @property
+    def _index_key(self) -> str:
+        return f"{settings.LLM_CACHE_PREFIX}index"
+
+    def _client(self) -> redis.Redis:
+        return get_redis()
+
+    def _count(self, name: str) -> None:
+        # per process only: a Redis round-trip per lookup would cost a local hit
+        # what the LRU saves; /metrics exports these and Prometheus sums them
+        with self._lock:
+            self.counters[name] += 1
+
+    # ---------- local LRU ----------
+    def _local_get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._local[key] = (time.time() + self.ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max:
+                self._local.popitem(last=False)
+
+    # ---------- public api ----------
+    def get(self, key: str) -> Optional[dict]:
+        value = self._local_get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        try:
+            raw = self._client().get(key)
+        except Exception:
+            self._count("errors")
+            raw = None
+        if raw is not None:
+            value = json.loads(raw)
+            self._local_set(key, value)
+            self._count("redis_hits")
+            return value
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: dict) -> None:
+        self._local_set(key, value)
+        try:
+            r = self._client()
+            pipe = r.pipeline(transaction=False)
+            pipe.set(key, json.dumps(value, ensure_ascii=False), ex=self.ttl)
+            pipe.zadd(self._index_key, {key: time.time()})
+            pipe.zremrangebyscore(self._index_key, "-inf", time.time() - self.ttl)
+            pipe.zcard(self._index_key)
+            size = pipe.execute()[-1]
+            if self.redis_max > 0 and size > self.redis_max:
+                evicted = r.zpopmin(self._index_key, size - self.redis_max)
+                if evicted:
+                    r.delete(*[k for k, _ in evicted])
+            self._count("writes")
+        except Exception:
+            self._count("errors")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self.counters)
+            c["local_entries"] = len(self._local)
+        lookups = c["local_hits"] + c["redis_hits"] + c["misses"]
+        c["hit_ratio"] = round((c["local_hits"] + c["redis_hits"]) / lookups, 4) if lookups else 0.0
+        return c
+
+
+llm_cache = LLMCache()
@@ -1,20 +1,245 @@
+import asyncio
 import json
-import google.generativeai as genai
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
 from app.core.config import settings
+from app.core.llm_cache import cache_key, llm_cache
+from app.core.llm_providers import LLMError, LLMRetryableError, get_provider
+from app.core.metrics import LLM_CALLS, LLM_TOKENS, span
+from app.core.rate_limit import llm_rate_limiter
+
+
+class LLMTimeoutError(LLMRetryableError):
+    pass
+
+
+class LLMUnavailableError(LLMError):
+    """Circuit open, rate-limit wait beyond the deadline, or retries exhausted."""
+
+
+class LLMInvalidJSONError(LLMError):
+    """The model kept answering with something that is not the requested JSON."""
+
+
+JSON_CONFIG: Dict[str, Any] = {"response_mime_type": "application/json"}
 
-genai.configure(api_key=settings.GOOGLE_API_KEY)
 
-def gen_json(prompt: str) -> dict:
-    model = genai.GenerativeModel(settings.GEMINI_MODEL)
-    out = model.generate_content(prompt)
-    txt = (out.text or "").strip()
+def _parse_json(txt: str) -> Optional[dict]:
+    txt = (txt or "").strip()
     try:
-        return json.loads(txt)
+        out = json.loads(txt)
+        return out if isinstance(out, dict) else None
     except Exception:
         s, e = txt.find("{"), txt.rfind("}")
         if s != -1 and e != -1 and e > s:
             try:
-                return json.loads(txt[s:e+1])
+                out = json.loads(txt[s:e+1])
+                return out if isinstance(out, dict) else None
             except Exception:
                 pass
-        return {"_raw": txt[:300]}
+        return None
+
+
+def _reask_prompt(prompt: str, bad: str, problem: str) -> str:
+    return (
+        f"{prompt}\n\nYour previous reply {problem}:\n{bad[:500]}\n\n"
+        "Reply again with ONLY the JSON object described above, with every key present."
+    )
+
+
+class CircuitBreaker:
+    """
+    Per-process breaker around the provider. After `threshold` consecutive
+    transient failures it opens and calls fail fast for `cooldown` seconds;
+    then one probe call is let through (half-open) and its outcome decides
+    whether the circuit closes again.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self) -> None:
+        """The call ended without an outcome (cancelled, or a bug); free the probe slot."""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self._failures}
+
+
+breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_COOLDOWN)
+
+
+def _check(result: Optional[dict], required: Tuple[str, ...], schema: Optional[Type[BaseModel]]) -> Tuple[Optional[dict], Optional[str]]:
+    """(validated object, None) or (None, what is wrong with it)"""
+    if result is None:
+        return None, "was not valid JSON"
+    missing = [k for k in required if k not in result]
+    if missing:
+        return None, f"was missing the keys {missing}"
+    if schema is not None:
+        try:
+            return schema.model_validate(result).model_dump(), None
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            return None, f"did not match the schema ({errors})"
+    return result, None
+
+
+def _backoff(attempt: int) -> float:
+    # full jitter: uniform(0, min(cap, base * 2^(attempt-1)))
+    return random.uniform(0, min(settings.LLM_BACKOFF_MAX, settings.LLM_BACKOFF_BASE * (2 ** (attempt - 1))))
+
+
+async def _generate(prompt: str, generation_config: Dict[str, Any], deadline: float, usage: Dict[str, Any]) -> str:
+    """One logical generation: rate limit, breaker, per-attempt timeout, backoff on transient errors."""
+    provider = get_provider()
+    loop = asyncio.get_running_loop()
+    last: Optional[Exception] = None
+    for attempt in range(1, settings.LLM_MAX_ATTEMPTS + 1):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        if not breaker.allow():
+            LLM_CALLS.labels(outcome="breaker_open").inc()
+            raise LLMUnavailableError("LLM circuit breaker is open")
+        if llm_rate_limiter.enabled and not await llm_rate_limiter.acquire(timeout=remaining):
+            raise LLMUnavailableError("LLM rate limit wait exceeds the call deadline")
+        timeout = min(settings.LLM_TIMEOUT, max(0.1, deadline - loop.time()))
+        usage["attempts"] += 1
+        try:
+            with span("llm_call", attempt=attempt):
+                resp = await asyncio.wait_for(provider.generate(prompt, generation_config, timeout=timeout), timeout)
+        except asyncio.TimeoutError:
+            LLM_CALLS.labels(outcome="timeout").inc()
+            last = LLMTimeoutError(f"LLM call timed out after {timeout:.1f}s")
+        except LLMRetryableError as e:
+            LLM_CALLS.labels(outcome="retryable_error").inc()
+            last = e
+        except LLMError:
+            LLM_CALLS.labels(outcome="error").inc()
+            breaker.record_success()  # the provider answered; the request itself is bad
+            raise
+        except BaseException:
+            # e.g. CancelledError when a sibling stage failed: no verdict on the
+            # provider, but a half-open probe must not hold the slot forever
+            breaker.release()
+            raise
+        else:
+            LLM_CALLS.labels(outcome="ok").inc()
+            LLM_TOKENS.labels(direction="input").inc(resp.input_tokens)
+            LLM_TOKENS.labels(direction="output").inc(resp.output_tokens)
+            breaker.record_success()
+            usage["input_tokens"] += resp.input_tokens
+            usage["output_tokens"] += resp.output_tokens
+            return resp.text
+        breaker.record_failure()
+        if attempt < settings.LLM_MAX_ATTEMPTS:
+            await asyncio.sleep(min(_backoff(attempt), max(0.0, deadline - loop.time())))
+    raise LLMUnavailableError(f"LLM failed after {usage['attempts']} attempts: {last or 'deadline exceeded'}")
+
+
+async def agen_json_usage(
+    prompt: str,
+    generation_config: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    required: Iterable[str] = (),
+    schema: Optional[Type[BaseModel]] = None,
+) -> Tuple[dict, Dict[str, Any]]:
+    """
+    Generate a JSON object in constrained JSON mode. If the reply does not
+    parse, lacks a `required` key or fails validation against the pydantic
+    `schema`, the model is re-asked (LLM_JSON_REASKS times) with its bad
+    answer and the problem quoted; after that LLMInvalidJSONError is raised,
+    so a malformed answer can never reach the job row. Returns the object
+    (schema-coerced when a schema is given) plus token usage summed over
+    attempts; a cache hit costs no tokens.
+    """
+    required = tuple(required)
+    config = {**JSON_CONFIG, **(generation_config or {})}
+    key = cache_key(get_provider().cache_namespace, prompt, generation_config)
+    if use_cache and settings.LLM_CACHE_ENABLED:
+        hit = await asyncio.to_thread(llm_cache.get, key)
+        hit, _ = _check(hit, required, schema)
+        if hit is not None:
+            return hit, {"input_tokens": 0, "output_tokens": 0, "attempts": 0, "cached": True}
+
+    usage: Dict[str, Any] = {"input_tokens": 0, "output_tokens": 0, "attempts": 0, "cached": False}
+    deadline = asyncio.get_running_loop().time() + settings.LLM_DEADLINE
+    ask = prompt
+    for _ in range(settings.LLM_JSON_REASKS + 1):
+        text = await _generate(ask, config, deadline, usage)
+        result, problem = _check(_parse_json(text), required, schema)
+        if result is not None:
+            if settings.LLM_CACHE_ENABLED:
+                await asyncio.to_thread(llm_cache.set, key, result)
+            return result, usage
+        LLM_CALLS.labels(outcome="invalid_json").inc()
+        ask = _reask_prompt(prompt, text, problem)
+    raise LLMInvalidJSONError(f"LLM reply {problem}")
+
+
+async def agen_json(
+    prompt: str,
+    generation_config: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    required: Iterable[str] = (),
+    schema: Optional[Type[BaseModel]] = None,
+) -> dict:
+    return (await agen_json_usage(prompt, generation_config, use_cache=use_cache, required=required, schema=schema))[0]
+
+
+def gen_json(
+    prompt: str,
+    generation_config: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    required: Iterable[str] = (),
+    schema: Optional[Type[BaseModel]] = None,
+) -> dict:
+    """Blocking wrapper for scripts; do not call from inside a running event loop."""
+    return asyncio.run(agen_json(prompt, generation_config, use_cache=use_cache, required=required, schema=schema))
+
+
+def stats() -> Dict[str, Any]:
+    return {"provider": settings.LLM_PROVIDER, "breaker": breaker.stats()}
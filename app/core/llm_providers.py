@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import random
+import re
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.tokenizer import count_tokens
+
+
+class LLMError(Exception):
+    """Non-retryable provider failure (bad request, auth, blocked prompt, ...)."""
+
+
+class LLMRetryableError(LLMError):
+    """Transient failure worth retrying: timeouts, 429s, 5xx."""
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    input_tokens: int
+    output_tokens: int
+
+
+class LLMProvider(ABC):
+    """
+    One LLM backend. generate() returns raw text plus token usage and raises
+    LLMRetryableError for transient failures; retries, deadlines, rate
+    limiting and the circuit breaker live in llm_client, not here. A backend
+    without generate() fails at instantiation.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}-{self.model}"
+
+    @abstractmethod
+    async def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> LLMResponse:
+        ...
+
+
+# google.api_core exception class names that are worth a retry
+_GEMINI_RETRYABLE = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+    "GatewayTimeout",
+    "Aborted",
+}
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, model: str):
+        super().__init__(model)
+        import google.generativeai as genai
+
+        genai.configure(api_key=settings.GOOGLE_API_KEY)
+        self._model = genai.GenerativeModel(model)  # built once, reused by every call
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.model  # keeps keys written before providers existed valid
+
+    async def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> LLMResponse:
+        request_options = {"timeout": timeout} if timeout else None
+        try:
+            # the sync client on a thread, not generate_content_async: the SDK caches
+            # its grpc.aio client, which stays bound to the first event loop, and
+            # every job runs in its own asyncio.run() on one of several threads
+            out = await asyncio.to_thread(
+                self._model.generate_content,
+                prompt,
+                generation_config=generation_config,
+                request_options=request_options,
+            )
+        except Exception as e:
+            if type(e).__name__ in _GEMINI_RETRYABLE:
+                raise LLMRetryableError(f"{type(e).__name__}: {e}") from e
+            raise LLMError(f"{type(e).__name__}: {e}") from e
+        try:
+            text = out.text
+        except ValueError as e:  # no candidates / blocked by safety filters
+            raise LLMError(f"empty response: {e}") from e
+        meta = getattr(out, "usage_metadata", None)
+        input_tokens = getattr(meta, "prompt_token_count", None)
+        output_tokens = getattr(meta, "candidates_token_count", None)
+        return LLMResponse(
+            text=text,
+            input_tokens=input_tokens if input_tokens is not None else count_tokens(prompt),
+            output_tokens=output_tokens if output_tokens is not None else count_tokens(text),
+        )
+
+
+_TEMPLATE_KEY = re.compile(r'"(\w+)"\s*:\s*([^,\n}]*)')
+
+
+class FakeProvider(LLMProvider):
+    """
+    Offline backend for tests and load benchmarks. It sleeps for
+    LLM_FAKE_LATENCY_MS +/- LLM_FAKE_JITTER_MS, optionally fails with
+    LLM_FAKE_FAILURE_RATE, and answers with JSON built from the keys of the
+    prompt's "Return STRICT JSON" template, deterministically per prompt.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        model: str,
+        latency_ms: float = settings.LLM_FAKE_LATENCY_MS,
+        jitter_ms: float = settings.LLM_FAKE_JITTER_MS,
+        failure_rate: float = settings.LLM_FAKE_FAILURE_RATE,
+    ):
+        super().__init__(model)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+
+    def _answer(self, prompt: str) -> str:
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        rnd = random.Random(seed)
+        template = prompt[prompt.rfind("Return STRICT JSON"):] if "Return STRICT JSON" in prompt else prompt
+        fields = []
+        for key, hint in _TEMPLATE_KEY.findall(template):
+            if "0..1" in hint or key.endswith("_rate"):
+                value = str(round(rnd.uniform(0.3, 0.95), 2))
+            elif "1..5" in hint or key.endswith("_score"):
+                value = str(rnd.choice([2.5, 3.0, 3.5, 4.0, 4.5]))
+            else:
+                value = f'"fake {key.replace("_", " ")} #{seed % 1000}"'
+            fields.append(f'"{key}": {value}')
+        return "{" + ", ".join(fields) + "}"
+
+    async def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> LLMResponse:
+        delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+        await asyncio.sleep(delay)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise LLMRetryableError("fake transient failure")
+        text = self._answer(prompt)
+        return LLMResponse(text=text, input_tokens=count_tokens(prompt), output_tokens=count_tokens(text))
+
+
+_PROVIDERS: Dict[str, Callable[[str], LLMProvider]] = {
+    "gemini": GeminiProvider,
+    "fake": FakeProvider,
+}
+_provider: Optional[LLMProvider] = None
+_provider_lock = threading.Lock()
+
+
+def register_provider(name: str, factory: Callable[[str], LLMProvider]) -> None:
+    _PROVIDERS[name] = factory
+
+
+def get_provider() -> LLMProvider:
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                try:
+                    factory = _PROVIDERS[settings.LLM_PROVIDER]
+                except KeyError:
+                    raise LLMError(f"unknown LLM_PROVIDER '{settings.LLM_PROVIDER}'") from None
+                _provider = factory(settings.GEMINI_MODEL)
+    return _provider
+
+
+def set_provider(provider: Optional[LLMProvider]) -> None:
+    """Swap the process-wide provider (tests, benchmarks); None re-reads LLM_PROVIDER."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,138 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+# seconds; covers a cached lookup (~ms) up to a slow LLM call with retries
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds", "Run time of each pipeline stage (excluding dependency waits)",
+    ["stage"], buckets=_BUCKETS,
+)
+SPAN_SECONDS = Histogram(
+    "hot_path_seconds", "Time spent in instrumented hot-path operations",
+    ["op"], buckets=_BUCKETS,
+)
+LLM_CALLS = Counter("llm_calls_total", "LLM provider attempts by outcome", ["outcome"])
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens sent to / received from the LLM", ["direction"])
+JOBS_FINISHED = Counter("jobs_finished_total", "Evaluation jobs reaching a terminal state", ["status"])
+JOB_SECONDS = Histogram("job_seconds", "Wall time of run_pipeline per job", buckets=_BUCKETS)
+JOBS_INFLIGHT = Gauge("jobs_inflight", "Jobs currently being processed by this process")
+EVALUATE_DEDUPED = Counter("evaluate_deduplicated_total", "POST /evaluate answered with an existing job", ["kind"])
+
+# slower-than-this spans are also logged, so a single slow job can be traced
+SLOW_SPAN_SECONDS = 2.0
+
+
+@contextmanager
+def span(op: str, **fields) -> Iterator[None]:
+    """Time a hot-path operation into hot_path_seconds{op=...}."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        SPAN_SECONDS.labels(op=op).observe(elapsed)
+        if elapsed >= SLOW_SPAN_SECONDS:
+            log.info("slow %s", op, extra={"op": op, "ms": round(1000 * elapsed, 1), **fields})
+
+
+class _StatsCollector:
+    """
+    Exposes counters that other modules already keep (LLM cache, context
+    cache, query-embedding LRU, embed batcher, queue depth, breaker) at scrape
+    time instead of duplicating them into prometheus objects.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def register(self, name: str, fn: Callable[[], Dict[str, float]]) -> None:
+        self._sources[name] = fn
+
+    def describe(self) -> List:
+        return []
+
+    def collect(self):
+        for name, fn in self._sources.items():
+            try:
+                values = fn()
+            except Exception as e:
+                log.warning("metrics source %s failed: %s", name, e)
+                continue
+            for key, value in values.items():
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    continue
+                metric = f"{name}_{key}"
+                if key.endswith("_total"):
+                    yield CounterMetricFamily(metric[: -len("_total")], f"{name} {key}", value=value)
+                else:
+                    yield GaugeMetricFamily(metric, f"{name} {key}", value=value)
+
+
+stats_collector = _StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def register_stats(name: str, fn: Callable[[], Dict[str, float]]) -> None:
+    stats_collector.register(name, fn)
+
+
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+_defaults_registered = False
+
+
+def register_default_stats() -> None:
+    """Wire the built-in stats sources; imported lazily to keep this module dependency-free."""
+    global _defaults_registered
+    if _defaults_registered:
+        return
+    from app.core import embedding_client, llm_client
+    from app.core.job_queue import get_queue
+    from app.core.llm_cache import llm_cache
+    from app.core.redis_client import embed_query
+    from app.services import search_service
+
+    def _llm_cache() -> Dict[str, float]:
+        s = llm_cache.stats()
+        out = {f"{k}_total": s[k] for k in ("local_hits", "redis_hits", "misses", "writes", "errors")}
+        out.update(entries=s["local_entries"], hit_ratio=s["hit_ratio"])
+        return out
+
+    def _query_embed_cache() -> Dict[str, float]:
+        info = embed_query.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits_total": info.hits,
+            "misses_total": info.misses,
+            "entries": info.currsize,
+            "hit_ratio": round(info.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _breaker() -> Dict[str, float]:
+        s = llm_client.breaker.stats()
+        return {"state": _BREAKER_STATES[s["state"]], "consecutive_failures": s["consecutive_failures"]}
+
+    def _batcher() -> Dict[str, float]:
+        s = embedding_client.batcher_stats()
+        return {
+            "batches_total": s.get("batches", 0),
+            "requests_total": s.get("requests", 0),
+            "avg_batch_size": s.get("avg_batch_size", 0.0),
+            "avg_queue_ms": s.get("avg_queue_ms", 0.0),
+        }
+
+    register_stats("llm_cache", _llm_cache)
+    register_stats("ctx_cache", search_service.ctx_cache_stats)
+    register_stats("query_embed_cache", _query_embed_cache)
+    register_stats("embed_batcher", _batcher)
+    register_stats("llm_breaker", _breaker)
+    register_stats("queue", lambda: get_queue().stats())
+    _defaults_registered = True
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Optional
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+# ---------- lua (atomic refill + take) ----------
+# KEYS[1] HASH {tokens, ts}; ARGV rate/sec, burst, cost.
+# Returns 0 if the tokens were taken, otherwise the milliseconds to wait.
+_TAKE_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  wait = math.ceil((cost - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return wait
+"""
+
+
+class TokenBucket:
+    """
+    Token bucket kept in Redis so every worker process shares one budget.
+    The clock is Redis' own TIME, so workers with skewed clocks agree. If
+    Redis is unreachable the limiter fails open rather than stalling jobs.
+    """
+
+    def __init__(self, key: str, rate: float, burst: int, client: Optional[redis.Redis] = None):
+        self.key = key
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._client = client
+        self._take = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _script(self):
+        if self._take is None:
+            self._take = (self._client or get_redis()).register_script(_TAKE_LUA)
+        return self._take
+
+    def try_take(self, cost: int = 1) -> float:
+        """Seconds to wait before retrying; 0.0 means the tokens were taken."""
+        if not self.enabled:
+            return 0.0
+        try:
+            wait_ms = self._script()(keys=[self.key], args=[self.rate, self.burst, cost])
+        except redis.RedisError as e:
+            log.warning("rate limiter unavailable (%s); allowing request", e)
+            return 0.0
+        return int(wait_ms) / 1000.0
+
+    async def acquire(self, cost: int = 1, timeout: Optional[float] = None) -> bool:
+        """Wait until the tokens are taken; False if that would take longer than timeout."""
+        loop = asyncio.get_running_loop()
+        give_up = None if timeout is None else loop.time() + timeout
+        while True:
+            wait = await asyncio.to_thread(self.try_take, cost)
+            if wait <= 0:
+                return True
+            if give_up is not None and loop.time() + wait > give_up:
+                return False
+            await asyncio.sleep(wait)
+
+
+llm_rate_limiter = TokenBucket(settings.LLM_RATE_KEY, settings.LLM_RATE_PER_SEC, settings.LLM_RATE_BURST)
@@ -1,15 +1,19 @@
 import time
-import uuid
-import array
-from typing import List, Dict, Any, Optional
+import json
+import hashlib
+import threading
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 
 import redis
 from urllib.parse import urlparse, urlunparse
-from sentence_transformers import SentenceTransformer
-from redis.commands.search.field import TextField, TagField, VectorField
+from redis.commands.search.field import NumericField, TextField, TagField, VectorField
+from redis.commands.search.index_definition import IndexDefinition, IndexType
 from redis.commands.search.query import Query
 
 from app.core.config import settings
+from app.core.embedding_client import embed_dim, embed_texts, f32
+from app.core.metrics import span
 
 
 # ---------- connection helper (fallback redis-stack -> localhost) ----------
@@ -44,22 +48,37 @@ def _connect(url: str, retries: int = 3, delay: float = 0.5):
     raise RuntimeError(f"Cannot connect to Redis. Tried {candidates}. Last error: {last_err}")
 
 
-# ---------- globals ----------
-r = _connect(settings.REDIS_URL)
-embedder = SentenceTransformer(settings.EMBEDDING_MODEL)
-EMBED_DIM = embedder.get_sentence_embedding_dimension()
+# ---------- globals (connection is opened on first use, not at import) ----------
+_r: Optional[redis.Redis] = None
+_r_lock = threading.Lock()
 INDEX_NAME = settings.INDEX_NAME
 DOC_PREFIX = settings.DOC_PREFIX
 
+def get_redis() -> redis.Redis:
+    global _r
+    if _r is None:
+        with _r_lock:
+            if _r is None:
+                _r = _connect(settings.REDIS_URL)
+    return _r
+
 
 # ---------- utils ----------
-def f32(v: List[float]) -> bytes:
-    arr = array.array("f", v)
-    return arr.tobytes()
+@lru_cache(maxsize=2048)
+def embed_query(query: str) -> Tuple[float, ...]:
+    with span("query_embed"):
+        return tuple(embed_texts([query])[0])
+
+
+# ---------- index version (bumped whenever ground-truth docs change) ----------
+VERSION_KEY = f"{INDEX_NAME}:version"
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
-    emb = embedder.encode(texts, normalize_embeddings=True)
-    return emb.tolist()
+def get_index_version() -> int:
+    v = get_redis().get(VERSION_KEY)
+    return int(v) if v else 0
+
+def bump_index_version() -> int:
+    return int(get_redis().incr(VERSION_KEY))
 
 
 # ---------- seed docs ----------
@@ -102,44 +121,192 @@ SEED_DOCS = [
 
 
 # ---------- index mgmt ----------
-def ensure_index_and_seed() -> None:
-    # create index if missing
+MANIFEST_KEY = f"{INDEX_NAME}:manifest"  # source -> {"sha": ..., "keys": [...]}
+_PIPELINE_FLUSH = 500
+
+def _s(v: Any) -> Any:
+    return v.decode() if isinstance(v, bytes) else v
+
+def _index_prefixes(info: Dict[Any, Any]) -> List[str]:
+    definition = info.get("index_definition") or info.get(b"index_definition") or []
+    items = [_s(x) for x in definition]
+    if "prefixes" in items:
+        return [_s(p) for p in items[items.index("prefixes") + 1]]
+    return []
+
+def ensure_index() -> None:
+    """
+    Create the ground-truth index scoped to DOC_PREFIX. An index left over from
+    before the prefix was set (which indexed every hash in the DB) is dropped
+    and rebuilt; the documents themselves are kept and re-indexed by Redis.
+    """
+    r = get_redis()
+    try:
+        info = r.ft(INDEX_NAME).info()
+        if _index_prefixes(info) == [DOC_PREFIX]:
+            return
+        r.ft(INDEX_NAME).dropindex(delete_documents=False)
+    except redis.ResponseError:
+        pass
+
+    schema = (
+        TextField("title"),
+        TextField("text"),
+        TagField("doc_type"),
+        TagField("source"),
+        VectorField(
+            "embedding",
+            "HNSW",
+            {"TYPE": "FLOAT32", "DIM": embed_dim(), "DISTANCE_METRIC": "COSINE"},
+        ),
+    )
+    r.ft(INDEX_NAME).create_index(schema, definition=IndexDefinition(prefix=[DOC_PREFIX], index_type=IndexType.HASH))
     try:
-        r.ft(INDEX_NAME).info()
+        r.execute_command("FT.CONFIG", "SET", "DEFAULT_DIALECT", "2")
     except Exception:
+        pass
+
+def read_manifest() -> Dict[str, Dict[str, Any]]:
+    raw = get_redis().hgetall(MANIFEST_KEY)
+    return {_s(k): json.loads(v) for k, v in raw.items()}
+
+def write_source(source: str, sha: str, docs: List[Dict[str, Any]], old_keys: Optional[List[str]] = None) -> List[str]:
+    """
+    Replace all chunks of one source in a single pipelined round-trip batch.
+    docs carry title/text/doc_type/embedding; keys are deterministic per source.
+    """
+    sid = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    keys = [f"{DOC_PREFIX}{sid}:{i}" for i in range(len(docs))]
+    pipe = get_redis().pipeline(transaction=False)
+    stale = set(old_keys or []) - set(keys)
+    if stale:
+        pipe.delete(*stale)
+    for i, (key, doc) in enumerate(zip(keys, docs)):
+        pipe.hset(key, mapping={
+            "title": doc["title"],
+            "text": doc["text"],
+            "doc_type": doc["doc_type"],
+            "source": source,
+            "chunk": i,
+            "embedding": f32(doc["embedding"]),
+        })
+        if (i + 1) % _PIPELINE_FLUSH == 0:
+            pipe.execute()
+    pipe.hset(MANIFEST_KEY, source, json.dumps({"sha": sha, "keys": keys}))
+    pipe.execute()
+    return keys
+
+def delete_source(source: str, keys: List[str]) -> None:
+    pipe = get_redis().pipeline(transaction=False)
+    if keys:
+        pipe.delete(*keys)
+    pipe.hdel(MANIFEST_KEY, source)
+    pipe.execute()
+
+def seed_sha(doc: Dict[str, str]) -> str:
+    return hashlib.sha256(f"{doc['doc_type']}\0{doc['title']}\0{doc['text']}".encode("utf-8")).hexdigest()
+
+_index_ready = False
+_index_lock = threading.Lock()
+
+def ensure_index_and_seed(force: bool = False) -> None:
+    """Create + seed the index; after the first success this is a no-op per process."""
+    global _index_ready
+    if _index_ready and not force:
+        return
+    with _index_lock:
+        if _index_ready and not force:
+            return
+        _ensure_index_and_seed()
+        _index_ready = True
+
+def _ensure_index_and_seed() -> None:
+    r = get_redis()
+    ensure_index()
+
+    # seed minimal (idempotent): only when nothing was ever ingested
+    if r.hlen(MANIFEST_KEY):
+        return
+    for _ in r.scan_iter(f"{DOC_PREFIX}*", count=100):
+        return
+    embs = embed_texts([doc["text"] for doc in SEED_DOCS])
+    for doc, emb in zip(SEED_DOCS, embs):
+        write_source(f"seed/{doc['doc_type']}", seed_sha(doc), [{**doc, "embedding": emb}])
+    bump_index_version()
+
+
+# ---------- candidate documents (per-upload vector namespace) ----------
+# Chunks of an uploaded CV/report live under CAND_DOC_PREFIX{sha}:{i}, tagged
+# with the upload's content hash, so identical files are embedded once and
+# every KNN over them is filtered to a single document.
+CAND_INDEX_NAME = settings.CAND_INDEX_NAME
+CAND_DOC_PREFIX = settings.CAND_DOC_PREFIX
+_cand_ready = False
+
+def ensure_candidate_index() -> None:
+    global _cand_ready
+    if _cand_ready:
+        return
+    r = get_redis()
+    try:
+        r.ft(CAND_INDEX_NAME).info()
+    except redis.ResponseError:
         schema = (
-            TextField("title"),
-            TextField("text"),
-            TagField("doc_type"),
+            TagField("doc"),
+            NumericField("chunk"),
             VectorField(
                 "embedding",
-                "HNSW",
-                {"TYPE": "FLOAT32", "DIM": EMBED_DIM, "DISTANCE_METRIC": "COSINE"},
+                "FLAT",
+                {"TYPE": "FLOAT32", "DIM": embed_dim(), "DISTANCE_METRIC": "COSINE"},
             ),
         )
-        r.ft(INDEX_NAME).create_index(schema)
         try:
-            r.execute_command("FT.CONFIG", "SET", "DEFAULT_DIALECT", "2")
-        except Exception:
-            pass
-
-    # seed minimal (idempotent)
-    has_any = False
-    for _ in r.scan_iter(f"{DOC_PREFIX}*"):
-        has_any = True
-        break
-    if not has_any:
-        for doc in SEED_DOCS:
-            emb = embed_texts([doc["text"]])[0]
-            r.hset(
-                f"{DOC_PREFIX}{uuid.uuid4()}",
-                mapping={
-                    "title": doc["title"],
-                    "text": doc["text"],
-                    "doc_type": doc["doc_type"],
-                    "embedding": f32(emb),
-                },
+            r.ft(CAND_INDEX_NAME).create_index(
+                schema, definition=IndexDefinition(prefix=[CAND_DOC_PREFIX], index_type=IndexType.HASH)
             )
+        except redis.ResponseError as e:
+            if "already exists" not in str(e).lower():
+                raise
+    _cand_ready = True
+
+def _cand_meta_key(doc_id: str) -> str:
+    return f"{CAND_INDEX_NAME}:doc:{doc_id}"
+
+def candidate_chunk_count(doc_id: str) -> int:
+    """Number of indexed chunks for doc_id; 0 if never indexed or expired (chunks share the TTL)."""
+    n = get_redis().get(_cand_meta_key(doc_id))
+    return int(n) if n is not None else 0
+
+def write_candidate_chunks(doc_id: str, chunks: List[str], embeddings: List[List[float]]) -> None:
+    pipe = get_redis().pipeline(transaction=False)
+    ttl = settings.CAND_CHUNK_TTL
+    for i, (text, emb) in enumerate(zip(chunks, embeddings)):
+        key = f"{CAND_DOC_PREFIX}{doc_id}:{i}"
+        pipe.hset(key, mapping={"doc": doc_id, "chunk": i, "text": text, "embedding": f32(emb)})
+        pipe.expire(key, ttl)
+    pipe.set(_cand_meta_key(doc_id), len(chunks), ex=ttl)
+    pipe.execute()
+
+def read_candidate_chunks(doc_id: str, n: int) -> Optional[List[Tuple[str, bytes]]]:
+    """(text, float32 embedding bytes) of the n stored chunks, or None if any has expired."""
+    pipe = get_redis().pipeline(transaction=False)
+    for i in range(n):
+        pipe.hmget(f"{CAND_DOC_PREFIX}{doc_id}:{i}", "text", "embedding")
+    rows = pipe.execute()
+    if any(text is None or emb is None for text, emb in rows):
+        return None
+    return [(text.decode("utf-8"), emb) for text, emb in rows]
+
+def knn_candidate(doc_id: str, qvec: Tuple[float, ...], k: int) -> List[Dict[str, Any]]:
+    q = (
+        Query(f"(@doc:{{{doc_id}}})=>[KNN {k} @embedding $vec AS score]")
+        .return_fields("chunk", "text", "score")
+        .sort_by("score")
+        .dialect(2)
+    )
+    with span("candidate_knn"):
+        res = get_redis().ft(CAND_INDEX_NAME).search(q, query_params={"vec": f32(qvec)})
+    return [{"chunk": int(d.chunk), "text": d.text, "score": float(d.score)} for d in res.docs]
 
 
 # ---------- public search api ----------
@@ -148,7 +315,9 @@ def knn_search(query: str, k: int = 3, types: Optional[List[str]] = None) -> Lis
     Vector KNN search with optional @doc_type tag filter.
     Make sure ensure_index_and_seed() has been called at least once.
     """
-    qvec = embed_texts([query])[0]
+    return knn_search_vec(embed_query(query), k=k, types=types)
+
+def knn_search_vec(qvec: Tuple[float, ...], k: int = 3, types: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     if types:
         tags = "|".join(types)
         base = f"(@doc_type:{{{tags}}})=>[KNN {k} @embedding $vec AS score]"
@@ -161,7 +330,8 @@ def knn_search(query: str, k: int = 3, types: Optional[List[str]] = None) -> Lis
         .sort_by("score")
         .dialect(2)
     )
-    res = r.ft(INDEX_NAME).search(q, query_params={"vec": f32(qvec)})
+    with span("knn"):
+        res = get_redis().ft(INDEX_NAME).search(q, query_params={"vec": f32(qvec)})
     return [
         {"title": d.title, "text": d.text, "doc_type": d.doc_type, "score": float(d.score)}
         for d in res.docs
@@ -0,0 +1,298 @@
+import json
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.embedding_client import embed_dim
+from app.core.metrics import span
+from app.core.redis_client import embed_query
+from app.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+SNAPSHOT_VECTORS = "vectors.npy"
+SNAPSHOT_META = "meta.json"
+
+
+class Retriever(ABC):
+    """
+    Vector search over the ground-truth corpus plus the per-candidate chunk
+    namespace. Scores are cosine distances (0 = identical), as RediSearch
+    returns them, and results are ordered closest first. A backend must
+    implement every abstract method; a missing one fails at instantiation.
+    """
+
+    name = "base"
+
+    def ensure_ready(self) -> None:
+        pass
+
+    @abstractmethod
+    def version(self) -> int:
+        ...
+
+    @abstractmethod
+    def search_vec(self, qvec: Sequence[float], k: int = 3, types: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def candidate_chunk_count(self, doc_id: str) -> int:
+        ...
+
+    @abstractmethod
+    def write_candidate_chunks(self, doc_id: str, chunks: List[str], embeddings: List[List[float]]) -> None:
+        ...
+
+    @abstractmethod
+    def candidate_vectors(self, doc_id: str, chunks: List[str]) -> Optional[np.ndarray]:
+        """The stored embeddings of doc_id if its stored chunks are exactly `chunks`, else None."""
+
+    @abstractmethod
+    def knn_candidate(self, doc_id: str, qvec: Sequence[float], k: int) -> List[Dict[str, Any]]:
+        ...
+
+
+class RedisRetriever(Retriever):
+    name = "redis"
+
+    def ensure_ready(self) -> None:
+        from app.core.redis_client import ensure_index_and_seed
+
+        ensure_index_and_seed()
+
+    def version(self) -> int:
+        from app.core.redis_client import get_index_version
+
+        return get_index_version()
+
+    def search_vec(self, qvec, k=3, types=None):
+        from app.core.redis_client import knn_search_vec
+
+        return knn_search_vec(tuple(qvec), k=k, types=types)
+
+    def candidate_chunk_count(self, doc_id):
+        from app.core.redis_client import candidate_chunk_count
+
+        return candidate_chunk_count(doc_id)
+
+    def write_candidate_chunks(self, doc_id, chunks, embeddings):
+        from app.core.redis_client import ensure_candidate_index, write_candidate_chunks
+
+        ensure_candidate_index()
+        write_candidate_chunks(doc_id, chunks, embeddings)
+
+    def candidate_vectors(self, doc_id, chunks):
+        from app.core.redis_client import read_candidate_chunks
+
+        stored = read_candidate_chunks(doc_id, len(chunks))
+        if stored is None or [text for text, _ in stored] != list(chunks):
+            return None
+        return np.stack([np.frombuffer(emb, dtype=np.float32) for _, emb in stored])
+
+    def knn_candidate(self, doc_id, qvec, k):
+        from app.core.redis_client import knn_candidate
+
+        return knn_candidate(doc_id, tuple(qvec), k)
+
+
+def _top_k(sims: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, sims.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-sims, k - 1)[:k]
+    return idx[np.argsort(-sims[idx])]
+
+
+class SnapshotMismatchError(Exception):
+    """The snapshot on disk was built for another embedding model (or is torn)."""
+
+
+def write_snapshot(path: str, docs: List[Dict[str, str]], vectors: Sequence[Sequence[float]], version: int) -> None:
+    """
+    Atomically write a snapshot: an .npy float32 matrix (rows L2-normalized)
+    that is memory-mapped on load, plus a JSON sidecar with the documents.
+    """
+    os.makedirs(path, exist_ok=True)
+    mat = np.asarray(vectors, dtype=np.float32).reshape(len(docs), -1)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    mat = mat / norms
+    meta = {
+        "version": version,
+        "model": settings.EMBEDDING_MODEL,
+        "dim": int(mat.shape[1]) if len(docs) else 0,
+        "docs": [{"title": d["title"], "text": d["text"], "doc_type": d["doc_type"]} for d in docs],
+    }
+    # forked workers may all build at once: each writes its own temp files
+    suffix = f"{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    tmp_vec = os.path.join(path, f".{SNAPSHOT_VECTORS}.{suffix}")
+    tmp_meta = os.path.join(path, f".{SNAPSHOT_META}.{suffix}")
+    with open(tmp_vec, "wb") as f:
+        np.save(f, mat)
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    # vectors first: a reader keys off meta.json, so it never sees new meta with old vectors
+    os.replace(tmp_vec, os.path.join(path, SNAPSHOT_VECTORS))
+    os.replace(tmp_meta, os.path.join(path, SNAPSHOT_META))
+
+
+class MemoryRetriever(Retriever):
+    """
+    In-process brute-force index: the whole corpus is one normalized float32
+    matrix memory-mapped from a snapshot, so cosine top-k is a single
+    mat-vec product plus argpartition, and doc_type filters are a boolean
+    mask over a small int array. Candidate chunks live in a per-process LRU.
+    The snapshot is re-read when its meta file changes on disk.
+    """
+
+    name = "memory"
+
+    def __init__(self, path: str = settings.RETRIEVER_SNAPSHOT_DIR):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self._version = 0
+        self._docs: List[Dict[str, str]] = []
+        self._mat = np.zeros((0, 0), dtype=np.float32)
+        self._type_ids = np.zeros(0, dtype=np.int16)
+        self._type_codes: Dict[str, int] = {}
+        self._cand: "OrderedDict[str, Tuple[List[str], np.ndarray]]" = OrderedDict()
+
+    # ---------- snapshot ----------
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, SNAPSHOT_META)
+
+    def _load(self) -> None:
+        with open(self._meta_path(), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        docs = meta["docs"]
+        if meta.get("model") != settings.EMBEDDING_MODEL:
+            raise SnapshotMismatchError(f"snapshot was embedded with {meta.get('model')!r}, not {settings.EMBEDDING_MODEL!r}")
+        if docs:
+            if meta.get("dim") != embed_dim():
+                raise SnapshotMismatchError(f"snapshot vectors have dim {meta.get('dim')}, the embedder {embed_dim()}")
+            mat = np.load(os.path.join(self.path, SNAPSHOT_VECTORS), mmap_mode="r")
+            if mat.shape != (len(docs), meta["dim"]):
+                raise SnapshotMismatchError(f"snapshot vectors {mat.shape} do not match meta.json")
+        else:
+            mat = np.zeros((0, meta.get("dim") or 0), dtype=np.float32)
+        codes: Dict[str, int] = {}
+        type_ids = np.array([codes.setdefault(d["doc_type"], len(codes)) for d in docs], dtype=np.int16)
+        self._docs, self._mat, self._type_ids, self._type_codes = docs, mat, type_ids, codes
+        self._version = int(meta.get("version", 0))
+        log.info("loaded %d ground-truth vectors from %s (version %d)", len(docs), self.path, self._version)
+
+    def _build_default(self) -> None:
+        # no snapshot yet: embed GROUND_DIR (or the seed docs) once and persist it
+        from app.services.ingest_service import build_snapshot
+
+        build_snapshot(snapshot_dir=self.path)
+
+    def _refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked < settings.RETRIEVER_RELOAD_INTERVAL:
+            return
+        with self._lock:
+            self._checked = now
+            if not os.path.exists(self._meta_path()):
+                self._build_default()
+            mtime = os.path.getmtime(self._meta_path())
+            if mtime != self._mtime:
+                try:
+                    self._load()
+                except SnapshotMismatchError as e:
+                    log.warning("rebuilding snapshot in %s: %s", self.path, e)
+                    self._build_default()
+                    mtime = os.path.getmtime(self._meta_path())
+                    self._load()
+                self._mtime = mtime
+
+    def ensure_ready(self) -> None:
+        self._refresh(force=self._mtime is None)
+
+    def version(self) -> int:
+        self.ensure_ready()
+        return self._version
+
+    # ---------- ground truth ----------
+    def search_vec(self, qvec, k=3, types=None):
+        self.ensure_ready()
+        docs, mat, type_ids = self._docs, self._mat, self._type_ids
+        if not docs:
+            return []
+        with span("knn"):
+            q = np.asarray(qvec, dtype=np.float32)
+            sims = mat @ q
+            if types:
+                wanted = [self._type_codes[t] for t in types if t in self._type_codes]
+                sims = np.where(np.isin(type_ids, wanted), sims, -np.inf)
+            idx = [i for i in _top_k(sims, k) if np.isfinite(sims[i])]
+        return [{**docs[i], "score": float(1.0 - sims[i])} for i in idx]
+
+    # ---------- candidate chunks ----------
+    def candidate_chunk_count(self, doc_id):
+        with self._lock:
+            item = self._cand.get(doc_id)
+            if item is None:
+                return 0
+            self._cand.move_to_end(doc_id)
+            return len(item[0])
+
+    def write_candidate_chunks(self, doc_id, chunks, embeddings):
+        mat = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            self._cand[doc_id] = (list(chunks), mat)
+            self._cand.move_to_end(doc_id)
+            while len(self._cand) > settings.RETRIEVER_CANDIDATE_MAX_DOCS:
+                self._cand.popitem(last=False)
+
+    def candidate_vectors(self, doc_id, chunks):
+        with self._lock:
+            item = self._cand.get(doc_id)
+        if item is None or item[0] != list(chunks):
+            return None
+        return item[1]
+
+    def knn_candidate(self, doc_id, qvec, k):
+        with self._lock:
+            chunks, mat = self._cand[doc_id]
+        with span("candidate_knn"):
+            sims = mat @ np.asarray(qvec, dtype=np.float32)
+            idx = _top_k(sims, k)
+        return [{"chunk": int(i), "text": chunks[i], "score": float(1.0 - sims[i])} for i in idx]
+
+
+_BACKENDS = {"redis": RedisRetriever, "memory": MemoryRetriever}
+_retriever: Optional[Retriever] = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> Retriever:
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                try:
+                    _retriever = _BACKENDS[settings.RETRIEVER_BACKEND]()
+                except KeyError:
+                    raise ValueError(f"unknown RETRIEVER_BACKEND '{settings.RETRIEVER_BACKEND}'") from None
+    return _retriever
+
+
+def set_retriever(retriever: Optional[Retriever]) -> None:
+    global _retriever
+    with _retriever_lock:
+        _retriever = retriever
+
+
+def knn_search(query: str, k: int = 3, types: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Top-k ground-truth docs for a text query, optionally restricted to doc_types."""
+    return get_retriever().search_vec(embed_query(query), k=k, types=types)
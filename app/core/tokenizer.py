@@ -0,0 +1,68 @@
+import threading
+from typing import List, Optional
+
+from app.core.config import settings
+from app.utils.helpers import approx_tokens
+from app.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+# Local tokenizer used for prompt budgeting. Gemini's own tokenizer is only
+# reachable through a network call, so we count with a SentencePiece
+# tokenizer (the embedding model's by default), which tracks it closely enough
+# for budgeting. If it cannot be loaded (or TOKENIZER_MODEL=approx), counts fall
+# back to a chars/4 estimate.
+_tok = None
+_tok_failed = False
+_tok_lock = threading.Lock()
+
+
+def _get():
+    global _tok, _tok_failed
+    if settings.TOKENIZER_MODEL == "approx":
+        return None
+    if _tok is None and not _tok_failed:
+        with _tok_lock:
+            if _tok is None and not _tok_failed:
+                try:
+                    from transformers import AutoTokenizer
+
+                    _tok = AutoTokenizer.from_pretrained(settings.TOKENIZER_MODEL or settings.EMBEDDING_MODEL)
+                except Exception as e:
+                    log.warning("tokenizer unavailable (%s); using chars/4 estimate", e)
+                    _tok_failed = True
+    return _tok
+
+
+def _ids(text: str) -> Optional[List[int]]:
+    tok = _get()
+    if tok is None:
+        return None
+    return tok(text, add_special_tokens=False, verbose=False)["input_ids"]
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    ids = _ids(text)
+    return len(ids) if ids is not None else approx_tokens(text)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, preferring a paragraph or line boundary."""
+    if max_tokens <= 0 or not text:
+        return ""
+    ids = _ids(text)
+    if ids is None:
+        if approx_tokens(text) <= max_tokens:
+            return text
+        cut = text[: max_tokens * 4]
+    else:
+        if len(ids) <= max_tokens:
+            return text
+        cut = _tok.decode(ids[:max_tokens], skip_special_tokens=True)
+    for sep in ("\n\n", "\n", ". "):
+        pos = cut.rfind(sep)
+        if pos >= len(cut) // 2:
+            return cut[: pos + len(sep)].rstrip()
+    return cut.rstrip()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Text, DateTime
+from sqlalchemy import Column, String, Float, Text, DateTime, BigInteger, Integer, ForeignKey, Index, LargeBinary
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
 
@@ -9,14 +9,87 @@ class JobResult(Base):
 
     id = Column(String, primary_key=True, index=True)
     job_title = Column(String)
-    cv_id = Column(String)
-    report_id = Column(String)
+    cv_id = Column(String, index=True)
+    report_id = Column(String, index=True)
+    batch_id = Column(String, nullable=True, index=True)
     cv_match_rate = Column(Float, nullable=True)
-    cv_feedback = Column(Text, nullable=True)
     project_score = Column(Float, nullable=True)
+    # legacy inline copies of the result texts; new results are written to
+    # job_result_texts and retention_service moves old ones there
+    cv_feedback = Column(Text, nullable=True)
     project_feedback = Column(Text, nullable=True)
     overall_summary = Column(Text, nullable=True)
     status = Column(String, default="queued")
     error = Column(Text, nullable=True)
+    triage_score = Column(Float, nullable=True)  # embedding similarity CV vs JD, when triage ran
+    input_tokens = Column(Integer, nullable=True)
+    output_tokens = Column(Integer, nullable=True)
+    stage_metrics = Column(Text, nullable=True)  # JSON: {stage: {"ms", "input_tokens", "output_tokens", "cached"}}
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # keyset listing (see job_query_service): equality filter first, then the
+    # sort column, then id as the tie-breaker
+    __table_args__ = (
+        Index("ix_job_results_created", "created_at", "id"),
+        Index("ix_job_results_status_created", "status", "created_at", "id"),
+        Index("ix_job_results_title_created", "job_title", "created_at", "id"),
+        Index("ix_job_results_title_cv_score", "job_title", "cv_match_rate", "id"),
+        Index("ix_job_results_title_project_score", "job_title", "project_score", "id"),
+    )
+
+class JobResultText(Base):
+    """Large result texts, kept out of the job_results rows that polls and status updates touch."""
+    __tablename__ = "job_result_texts"
+
+    job_id = Column(String, ForeignKey("job_results.id", ondelete="CASCADE"), primary_key=True)
+    cv_feedback = Column(Text, nullable=True)
+    project_feedback = Column(Text, nullable=True)
+    overall_summary = Column(Text, nullable=True)
+
+class JobArchive(Base):
+    """Finished jobs past RETENTION_DAYS, moved out of job_results by retention_service."""
+    __tablename__ = "job_results_archive"
+
+    id = Column(String, primary_key=True)
+    job_title = Column(String)
+    status = Column(String)
+    batch_id = Column(String, nullable=True, index=True)
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow, index=True)
+    payload = Column(LargeBinary, nullable=False)  # zlib-compressed JSON of the job row and its texts
+
+class JobCheckpoint(Base):
+    __tablename__ = "job_checkpoints"
+
+    job_id = Column(String, ForeignKey("job_results.id", ondelete="CASCADE"), primary_key=True)
+    stage = Column(String, primary_key=True)
+    output = Column(Text, nullable=False)  # JSON-encoded stage result
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    job_title = Column(String)
+    total = Column(Integer, nullable=False)
+    max_concurrency = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class UploadedFile(Base):
+    __tablename__ = "uploaded_files"
+
+    id = Column(String, primary_key=True)
+    path = Column(String, nullable=False)  # relative to UPLOAD_DIR
+    filename = Column(String, nullable=True)
+    content_type = Column(String, nullable=True)
+    size = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False, unique=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class UploadAlias(Base):
+    __tablename__ = "upload_aliases"
+
+    id = Column(String, primary_key=True)  # legacy upload id whose bytes another id registered first
+    upload_id = Column(String, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,13 +1,29 @@
-from fastapi import FastAPI
+import threading
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.middleware import RequestSizeLimitMiddleware
 from app.api.v1.routers import api_router
+from app.core import embedding_client
 from app.core.config import settings
-from app.db.models import Base
-from app.db.session import engine
+from app.core.metrics import register_default_stats
+from app.db.session import init_db
+from app.utils.logger import configure_logging, get_logger
+
+log = get_logger(__name__)
+
+
+def _warm_embedder() -> None:
+    try:
+        embedding_client.warm_up()
+        log.info("embedding model loaded in %.1fs", embedding_client.load_seconds())
+    except Exception as e:
+        log.error("embedding model failed to load: %s", e)
 
 
 def create_app() -> FastAPI:
+    configure_logging()
     app = FastAPI(title=settings.APP_NAME)
 
     if settings.BACKEND_CORS_ORIGINS:
@@ -19,6 +35,12 @@ def create_app() -> FastAPI:
             allow_headers=["*"],
         )
 
+    app.add_middleware(
+        RequestSizeLimitMiddleware,
+        max_bytes=settings.MAX_UPLOAD_REQUEST_BYTES,
+        paths=["/evaluate/upload"],
+    )
+
     @app.get("/", tags=["Health"])
     def root():
         return {
@@ -31,13 +53,23 @@ def create_app() -> FastAPI:
             "redis_index": settings.INDEX_NAME,
         }
 
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+        register_default_stats()
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
     app.include_router(api_router, prefix=settings.API_V1_STR)
 
     @app.on_event("startup")
     async def on_startup():
-        Base.metadata.create_all(bind=engine)
-        print("✅ Database initialized")
-        print(f"🚀 {settings.APP_NAME} running at {settings.SERVER_HOST}:{settings.SERVER_PORT}")
+        init_db()
+        log.info("database initialized")
+        if settings.EMBEDDING_WARMUP_ON_STARTUP:
+            # load in the background: liveness answers immediately, /ready flips once loaded
+            threading.Thread(target=_warm_embedder, name="embedder-warmup", daemon=True).start()
+        log.info("%s running at %s:%s", settings.APP_NAME, settings.SERVER_HOST, settings.SERVER_PORT)
 
     return app
 
@@ -0,0 +1,143 @@
+import json
+import uuid
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+
+from app.core.config import settings
+from app.core.job_queue import get_queue
+from app.db.session import SessionLocal
+from app.db.models import BatchJob, JobArchive, JobResult
+from app.services.pipeline_service import JOB_WITH_TEXTS, RESULT_TEXTS
+
+
+def _backlog_key(batch_id: str) -> str:
+    return f"{settings.QUEUE_NAME}:batch:{batch_id}:backlog"
+
+
+def create_batch(
+    job_title: str,
+    items: List[Dict[str, str]],
+    max_concurrency: Optional[int] = None,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Persist one JobResult per (cv_id, report_id) and park their payloads in a
+    per-batch backlog. Only max_concurrency jobs sit in the shared queue at a
+    time; each finished job releases the next one (see release_next).
+    """
+    batch_id = str(uuid.uuid4())
+    conc = min(max_concurrency or settings.BATCH_DEFAULT_CONCURRENCY, len(items))
+    job_ids = [str(uuid.uuid4()) for _ in items]
+
+    db = SessionLocal()
+    try:
+        db.add(BatchJob(id=batch_id, job_title=job_title, total=len(items), max_concurrency=conc))
+        db.add_all([
+            JobResult(
+                id=job_id,
+                job_title=job_title,
+                cv_id=it["cv_id"],
+                report_id=it["report_id"],
+                batch_id=batch_id,
+                status="queued",
+            )
+            for job_id, it in zip(job_ids, items)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    r = get_queue().r
+    pipe = r.pipeline(transaction=False)
+    for job_id, it in zip(job_ids, items):
+        pipe.rpush(_backlog_key(batch_id), json.dumps({
+            "job_id": job_id,
+            "job_title": job_title,
+            "cv_id": it["cv_id"],
+            "report_id": it["report_id"],
+            "use_cache": use_cache,
+            "batch_id": batch_id,
+        }))
+    pipe.execute()
+    release_next(batch_id, conc)
+    return {"id": batch_id, "total": len(items), "max_concurrency": conc, "status": "queued"}
+
+
+def release_next(batch_id: str, n: int = 1) -> int:
+    queue = get_queue()
+    released = 0
+    for _ in range(n):
+        raw = queue.r.lpop(_backlog_key(batch_id))
+        if not raw:
+            break
+        payload = json.loads(raw)
+        queue.enqueue(payload.pop("job_id"), payload, force=True)
+        released += 1
+    return released
+
+
+def get_batch(batch_id: str, limit: int = 50) -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        batch = db.query(BatchJob).filter(BatchJob.id == batch_id).first()
+        if not batch:
+            return {}
+        counts = dict(
+            db.query(JobResult.status, func.count())
+            .filter(JobResult.batch_id == batch_id)
+            .group_by(JobResult.status)
+            .all()
+        )
+        # jobs past RETENTION_DAYS still count towards progress, but are not ranked
+        archived = dict(
+            db.query(JobArchive.status, func.count())
+            .filter(JobArchive.batch_id == batch_id)
+            .group_by(JobArchive.status)
+            .all()
+        )
+        ranked = (
+            db.query(
+                JobResult.id,
+                JobResult.cv_id,
+                JobResult.report_id,
+                JobResult.cv_match_rate,
+                JobResult.project_score,
+                RESULT_TEXTS["overall_summary"],
+            )
+            .select_from(JOB_WITH_TEXTS)
+            .filter(JobResult.batch_id == batch_id, JobResult.status == "completed")
+            .order_by(
+                JobResult.cv_match_rate.desc().nulls_last(),
+                JobResult.project_score.desc().nulls_last(),
+            )
+            .limit(limit)
+            .all()
+        )
+    finally:
+        db.close()
+
+    progress = {
+        s: counts.get(s, 0) + archived.get(s, 0)
+        for s in ("queued", "processing", "completed", "screened_out", "failed")
+    }
+    done = progress["completed"] + progress["screened_out"] + progress["failed"]
+    return {
+        "id": batch.id,
+        "job_title": batch.job_title,
+        "total": batch.total,
+        "max_concurrency": batch.max_concurrency,
+        "status": "completed" if done >= batch.total else "processing",
+        "progress": progress,
+        "results": [
+            {
+                "id": row.id,
+                "cv_id": row.cv_id,
+                "report_id": row.report_id,
+                "cv_match_rate": row.cv_match_rate,
+                "project_score": row.project_score,
+                "overall_summary": row.overall_summary,
+            }
+            for row in ranked
+        ],
+    }
@@ -0,0 +1,37 @@
+import json
+from typing import Any, Dict
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.metrics import span
+from app.db.models import JobCheckpoint
+from app.db.session import engine
+
+
+def load_checkpoints(job_id: str) -> Dict[str, Any]:
+    """stage name -> decoded output for every stage this job already finished"""
+    stmt = select(JobCheckpoint.stage, JobCheckpoint.output).where(JobCheckpoint.job_id == job_id)
+    with engine.connect() as conn:
+        return {row.stage: json.loads(row.output) for row in conn.execute(stmt)}
+
+
+def save_checkpoint(job_id: str, stage: str, output: Any) -> None:
+    """
+    Persist one finished stage. Stage outputs are deterministic for a given
+    job, so a row that already exists (a re-run racing a stale worker) is kept.
+    """
+    try:
+        with span("db_checkpoint"), engine.begin() as conn:
+            conn.execute(insert(JobCheckpoint).values(
+                job_id=job_id,
+                stage=stage,
+                output=json.dumps(output, ensure_ascii=False),
+            ))
+    except IntegrityError:
+        pass
+
+
+def clear_checkpoints(job_id: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(delete(JobCheckpoint).where(JobCheckpoint.job_id == job_id))
@@ -0,0 +1,109 @@
+import hashlib
+import json
+from typing import Callable, Optional
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+# A dedup key maps one logical evaluation request to the job that serves it:
+#   {q}:idem:<sha256(Idempotency-Key)>   explicit client key
+#   {q}:dedup:<fingerprint>              same (job_title, cv_id, report_id, callback_url)
+# value: {"job": job_id, "fp": fingerprint, "state": "pending" | "ok"}
+# A key is reserved as "pending" with a short TTL before the job row exists and
+# committed with IDEMPOTENCY_TTL once it does, so a request that dies in between
+# blocks its duplicates for seconds, not a day.
+PENDING_TTL = 30
+
+# KEYS[1] dedup key; ARGV expected value, new value, ttl. SET only if unchanged.
+_CAS_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  redis.call('SET', KEYS[1], ARGV[2], 'EX', tonumber(ARGV[3]))
+  return 1
+end
+return 0
+"""
+
+# KEYS[1] dedup key; ARGV expected value. DEL only if unchanged.
+_DEL_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_scripts = {}
+
+
+class IdempotencyConflictError(Exception):
+    """The Idempotency-Key was already used for a different request."""
+
+
+def _script(name: str, body: str):
+    if name not in _scripts:
+        _scripts[name] = get_redis().register_script(body)
+    return _scripts[name]
+
+
+def fingerprint(job_title: str, cv_id: str, report_id: str, callback_url: Optional[str] = None) -> str:
+    # the callback is part of the request: a repeat asking for a webhook elsewhere
+    # must not be folded into a job that will never notify it
+    title = " ".join(job_title.split()).lower()
+    parts = [title, cv_id, report_id] + ([callback_url] if callback_url else [])
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def dedup_key(fp: str, idempotency_key: Optional[str] = None) -> str:
+    if idempotency_key:
+        return f"{settings.QUEUE_NAME}:idem:{hashlib.sha256(idempotency_key.encode('utf-8')).hexdigest()}"
+    return f"{settings.QUEUE_NAME}:dedup:{fp}"
+
+
+def _value(job_id: str, fp: str, state: str) -> str:
+    return json.dumps({"job": job_id, "fp": fp, "state": state}, sort_keys=True)
+
+
+def reserve(
+    key: str,
+    job_id: str,
+    fp: str,
+    reusable: Callable[[str], Optional[bool]],
+    check_fp: bool = False,
+) -> Optional[str]:
+    """
+    Claim `key` for job_id (SET NX). Returns None if the caller now owns it and
+    must create the job, or the id of the job that already serves the request.
+    `reusable(existing_id)` decides whether a committed holder still counts:
+    True reuses it, False (e.g. failed) takes the key over with a CAS, None
+    means the job row is gone. With check_fp a holder for a different
+    fingerprint raises IdempotencyConflictError.
+    """
+    r = get_redis()
+    mine = _value(job_id, fp, "pending")
+    for _ in range(3):
+        if r.set(key, mine, nx=True, ex=PENDING_TTL):
+            return None
+        raw = r.get(key)
+        if raw is None:
+            continue  # expired between SET and GET
+        held = json.loads(raw)
+        if check_fp and held["fp"] != fp:
+            raise IdempotencyConflictError("Idempotency-Key was already used for a different request")
+        if held["state"] == "pending" or reusable(held["job"]):
+            return held["job"]
+        if _script("cas", _CAS_LUA)(keys=[key], args=[raw, mine, PENDING_TTL]):
+            return None
+    # lost every race; whoever won is serving the request
+    return json.loads(r.get(key) or "{}").get("job")
+
+
+def commit(key: str, job_id: str, fp: str) -> None:
+    """The job row exists: keep the mapping for IDEMPOTENCY_TTL."""
+    _script("cas", _CAS_LUA)(
+        keys=[key], args=[_value(job_id, fp, "pending"), _value(job_id, fp, "ok"), settings.IDEMPOTENCY_TTL]
+    )
+
+
+def release(key: str, job_id: str, fp: str) -> None:
+    """Give the key up (the job could not be queued) so the client's retry is admitted."""
+    for state in ("pending", "ok"):
+        _script("del", _DEL_LUA)(keys=[key], args=[_value(job_id, fp, state)])
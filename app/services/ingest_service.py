@@ -1,46 +1,227 @@
-import uuid
-from app.core.redis_client import ensure_index, hset_doc
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
 from app.core.embedding_client import embed_texts
+from app.core.redis_client import (
+    DOC_PREFIX,
+    SEED_DOCS,
+    bump_index_version,
+    delete_source,
+    ensure_index,
+    get_redis,
+    read_manifest,
+    seed_sha,
+    write_source,
+)
+from app.utils.file_io import read_file_text
+from app.utils.helpers import chunk_text
+from app.utils.logger import configure_logging, get_logger
+
+log = get_logger(__name__)
+
+DOC_TYPES = ("job_description", "case_brief", "cv_rubric", "project_rubric")
+INGEST_EXTS = (".txt", ".md", ".pdf", ".json")
+
+# A ground-truth source is one file (or one entry of a JSON list); its chunks
+# are stored under deterministic keys and tracked in the index manifest so a
+# re-run only embeds sources whose content hash changed.
+Source = Dict[str, Any]  # {"source", "title", "text", "doc_type", "sha"}
+
+
+def _doc_type_for(relpath: str) -> Optional[str]:
+    parts = relpath.replace("\\", "/").lower().split("/")
+    for part in parts[:-1]:
+        if part in DOC_TYPES:
+            return part
+    name = parts[-1]
+    for t in DOC_TYPES:
+        if name.startswith(t):
+            return t
+    return None
+
+
+def _title_for(path: str, text: str) -> str:
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#"):
+            return line.lstrip("#").strip() or line
+        if line:
+            break
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem.replace("_", " ").replace("-", " ").strip().title()
+
+
+def _source(source: str, title: str, text: str, doc_type: str) -> Source:
+    doc = {"source": source, "title": title, "text": text.strip(), "doc_type": doc_type}
+    doc["sha"] = seed_sha(doc)
+    return doc
+
+
+def _from_json(relpath: str, path: str) -> Iterator[Source]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    items = data if isinstance(data, list) else [data]
+    fallback_type = _doc_type_for(relpath)
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("text"):
+            continue
+        doc_type = item.get("doc_type") or fallback_type
+        if doc_type not in DOC_TYPES:
+            log.warning("skipping %s[%d]: unknown doc_type %r", relpath, i, doc_type)
+            continue
+        source = relpath if len(items) == 1 else f"{relpath}#{i}"
+        yield _source(source, item.get("title") or _title_for(path, item["text"]), item["text"], doc_type)
+
+
+def scan_ground_dir(ground_dir: str = settings.GROUND_DIR) -> List[Source]:
+    """
+    Collect JDs, case briefs and rubrics from ground_dir. The doc_type comes
+    from a parent directory named after it (job_description/, cv_rubric/, ...)
+    or a filename prefix; JSON files may set doc_type/title per entry.
+    """
+    out: List[Source] = []
+    if not os.path.isdir(ground_dir):
+        return out
+    for root, dirs, files in os.walk(ground_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.lower().endswith(INGEST_EXTS) or name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            relpath = os.path.relpath(path, ground_dir).replace(os.sep, "/")
+            if name.lower().endswith(".json"):
+                try:
+                    out.extend(_from_json(relpath, path))
+                except (OSError, ValueError) as e:
+                    log.warning("skipping %s: %s", relpath, e)
+                continue
+            doc_type = _doc_type_for(relpath)
+            if doc_type is None:
+                log.warning("skipping %s: cannot infer doc_type", relpath)
+                continue
+            text = read_file_text(path)
+            if not text.strip() or text.startswith("(pdf parse error") or text == "(empty pdf text)":
+                log.warning("skipping %s: no extractable text", relpath)
+                continue
+            out.append(_source(relpath, _title_for(path, text), text, doc_type))
+    return out
+
+
+def _seed_sources() -> List[Source]:
+    return [_source(f"seed/{d['doc_type']}", d["title"], d["text"], d["doc_type"]) for d in SEED_DOCS]
+
+
+def _chunks(src: Source) -> List[Dict[str, str]]:
+    parts = chunk_text(src["text"], settings.INGEST_CHUNK_CHARS, settings.INGEST_CHUNK_OVERLAP)
+    return [{"title": src["title"], "text": p, "doc_type": src["doc_type"]} for p in parts]
 
-SEED_DOCS = [
-    {
-        "title": "Backend Job Description",
-        "text": (
-            "Product Engineer (Backend): build APIs, DB schemas, scalable services; "
-            "integrate LLMs (prompting, chaining, RAG); handle async jobs & retries; "
-            "testing & clean code; collaborate with FE & PM; cloud experience preferred."
-        ),
-        "doc_type": "job_description",
-    },
-    {
-        "title": "Case Study Brief",
-        "text": (
-            "Build backend service to auto-screen candidates by comparing CV and Project Report "
-            "to Job Description and Case Study guidelines. Use RAG over internal docs (job desc, brief, rubrics). "
-            "Pipeline must be asynchronous and resilient; output cv_match_rate, project_score, feedbacks, and summary."
-        ),
-        "doc_type": "case_brief",
-    },
-    {
-        "title": "CV Rubric",
-        "text": (
-            "CV evaluation: Technical skills match (40), Experience level (25), Achievements (20), Cultural fit (15). "
-            "All scored 1-5; emphasize backend, databases, APIs, cloud, and AI/LLM exposure."
-        ),
-        "doc_type": "cv_rubric",
-    },
-    {
-        "title": "Project Rubric",
-        "text": (
-                "Project evaluation: Correctness (prompting/chaining/RAG) 30, Code quality 25, "
-                "Resilience & error handling 20, Documentation 15, Creativity 10. Score 1-5."
-        ),
-        "doc_type": "project_rubric",
-    },
-]
-
-def ingest_seed() -> None:
+
+def _embed_all(texts: List[str]) -> List[List[float]]:
+    out: List[List[float]] = []
+    step = max(1, settings.INGEST_EMBED_BATCH)
+    for i in range(0, len(texts), step):
+        out.extend(embed_texts(texts[i:i + step]))
+    return out
+
+
+def _prune_unmanaged(managed: set) -> int:
+    """Drop DOC_PREFIX hashes not owned by any manifest source (e.g. old uuid-keyed seeds)."""
+    r = get_redis()
+    stale = []
+    for key in r.scan_iter(f"{DOC_PREFIX}*", count=500):
+        k = key.decode() if isinstance(key, bytes) else key
+        if k not in managed:
+            stale.append(k)
+    for i in range(0, len(stale), 500):
+        r.delete(*stale[i:i + 500])
+    return len(stale)
+
+
+def ingest(ground_dir: str = settings.GROUND_DIR, prune: bool = True) -> Dict[str, int]:
+    """
+    Incrementally sync the vector index with ground_dir (or SEED_DOCS if it is
+    empty): unchanged sources are skipped by content hash, changed ones are
+    re-chunked and embedded in large batches and written with pipelines, and
+    sources that disappeared are deleted. The index version is bumped only if
+    something changed, so context caches stay warm across no-op runs.
+    """
     ensure_index()
-    for d in SEED_DOCS:
-        emb = embed_texts([d["text"]])[0]
-        hset_doc({"id": str(uuid.uuid4()), "title": d["title"], "text": d["text"], "doc_type": d["doc_type"], "embedding": emb})
+    sources = scan_ground_dir(ground_dir) or _seed_sources()
+    manifest = read_manifest()
+
+    changed = [s for s in sources if manifest.get(s["source"], {}).get("sha") != s["sha"]]
+    seen = {s["source"] for s in sources}
+    removed = [name for name in manifest if name not in seen]
+
+    plan: List[Tuple[Source, List[Dict[str, str]]]] = [(s, _chunks(s)) for s in changed]
+    texts = [c["text"] for _, chunks in plan for c in chunks]
+    vectors = _embed_all(texts) if texts else []
+
+    offset = 0
+    managed = {k for name in seen if name in manifest for k in manifest[name].get("keys", [])}
+    for src, chunks in plan:
+        for c in chunks:
+            c["embedding"] = vectors[offset]
+            offset += 1
+        old_keys = manifest.get(src["source"], {}).get("keys", [])
+        managed.difference_update(old_keys)
+        managed.update(write_source(src["source"], src["sha"], chunks, old_keys))
+
+    for name in removed:
+        delete_source(name, manifest[name].get("keys", []))
+
+    pruned = _prune_unmanaged(managed) if prune else 0
+    stats = {
+        "sources": len(sources),
+        "changed": len(changed),
+        "unchanged": len(sources) - len(changed),
+        "removed": len(removed),
+        "pruned": pruned,
+        "chunks_embedded": len(texts),
+    }
+    if changed or removed or pruned:
+        bump_index_version()
+    return stats
+
+
+def ingest_seed() -> Dict[str, int]:
+    return ingest()
+
+
+def build_snapshot(ground_dir: str = settings.GROUND_DIR, snapshot_dir: str = settings.RETRIEVER_SNAPSHOT_DIR) -> Dict[str, int]:
+    """
+    Chunk + embed the same sources as ingest() into an on-disk snapshot for
+    the in-memory retriever. Needs no Redis. The version is derived from the
+    source hashes, so rebuilding unchanged sources keeps context caches valid.
+    """
+    from app.core.retriever import write_snapshot
+
+    sources = scan_ground_dir(ground_dir) or _seed_sources()
+    chunks = [c for s in sources for c in _chunks(s)]
+    vectors = _embed_all([c["text"] for c in chunks]) if chunks else []
+    # the model is part of the version: re-embedding the same sources must still
+    # invalidate contexts retrieved with the old vectors
+    digest = hashlib.sha256("\0".join([settings.EMBEDDING_MODEL, *sorted(s["sha"] for s in sources)]).encode()).hexdigest()
+    write_snapshot(snapshot_dir, chunks, vectors, version=int(digest[:12], 16))
+    return {"sources": len(sources), "chunks": len(chunks)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sync ground-truth documents into the vector index.")
+    parser.add_argument("--dir", default=settings.GROUND_DIR)
+    parser.add_argument("--no-prune", action="store_true", help="keep index keys not tracked by the manifest")
+    parser.add_argument("--snapshot", action="store_true", help="also write the in-memory retriever snapshot")
+    parser.add_argument("--snapshot-only", action="store_true", help="write the snapshot without touching Redis")
+    args = parser.parse_args()
+    configure_logging()
+    out: Dict[str, Any] = {}
+    if not args.snapshot_only:
+        out["redis"] = ingest(args.dir, prune=not args.no_prune)
+    if args.snapshot or args.snapshot_only:
+        out["snapshot"] = build_snapshot(args.dir)
+    print(json.dumps(out))
@@ -0,0 +1,167 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_, select
+
+from app.db.models import JobResult
+from app.db.session import engine
+from app.services.pipeline_service import JOB_WITH_TEXTS, RESULT_TEXT_COLUMNS
+
+SORT_COLUMNS = {
+    "created_at": JobResult.created_at,
+    "cv_match_rate": JobResult.cv_match_rate,
+    "project_score": JobResult.project_score,
+}
+
+LIST_COLUMNS = (
+    JobResult.id,
+    JobResult.job_title,
+    JobResult.status,
+    JobResult.batch_id,
+    JobResult.cv_id,
+    JobResult.report_id,
+    JobResult.cv_match_rate,
+    JobResult.project_score,
+    JobResult.triage_score,
+    JobResult.error,
+    JobResult.created_at,
+    JobResult.updated_at,
+)
+
+EXPORT_COLUMNS = LIST_COLUMNS + RESULT_TEXT_COLUMNS + (
+    JobResult.input_tokens,
+    JobResult.output_tokens,
+)
+
+EXPORT_BATCH_ROWS = 1000
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def _encode_cursor(sort: str, value: Any, job_id: str) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, job_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str) -> Tuple[Any, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cur_sort, value, job_id = json.loads(raw)
+        if cur_sort == sort == "created_at":
+            value = datetime.fromisoformat(value)
+    except Exception:
+        raise InvalidCursorError("malformed cursor") from None
+    if cur_sort != sort:
+        raise InvalidCursorError(f"cursor was issued for sort={cur_sort}")
+    # score sorts compare against a number; anything else would reach the DB as a 500
+    numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+    if not isinstance(job_id, str) or (sort != "created_at" and not numeric):
+        raise InvalidCursorError("malformed cursor")
+    return value, job_id
+
+
+def _query(
+    columns: Sequence,
+    job_title: Optional[str] = None,
+    status: Optional[List[str]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+):
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"unknown sort '{sort}'")
+    col = SORT_COLUMNS[sort]
+    stmt = select(*columns)
+    if job_title:
+        stmt = stmt.where(JobResult.job_title == job_title)
+    if status:
+        stmt = stmt.where(JobResult.status.in_(status))
+    if created_from:
+        stmt = stmt.where(JobResult.created_at >= created_from)
+    if created_to:
+        stmt = stmt.where(JobResult.created_at < created_to)
+    if sort != "created_at":
+        # unscored jobs have no place in a score ranking; this also keeps the keyset free of NULLs
+        stmt = stmt.where(col.is_not(None))
+    if order == "asc":
+        return stmt.order_by(col.asc(), JobResult.id.asc()), col
+    return stmt.order_by(col.desc(), JobResult.id.desc()), col
+
+
+def list_jobs(
+    job_title: Optional[str] = None,
+    status: Optional[List[str]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    One page of jobs plus an opaque next_cursor. Pages are keyset-based:
+    (sort column, id) of the last row bounds the next query, so page N costs
+    the same index range scan as page 1, and rows inserted meanwhile do not
+    shift later pages.
+    """
+    stmt, col = _query(LIST_COLUMNS, job_title, status, created_from, created_to, sort, order)
+    if cursor:
+        value, last_id = _decode_cursor(cursor, sort)
+        if order == "asc":
+            stmt = stmt.where(or_(col > value, and_(col == value, JobResult.id > last_id)))
+        else:
+            stmt = stmt.where(or_(col < value, and_(col == value, JobResult.id < last_id)))
+    with engine.connect() as conn:
+        rows = conn.execute(stmt.limit(limit + 1)).all()
+    items = [dict(r._mapping) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = _encode_cursor(sort, last[sort], last["id"])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def iter_jobs(**filters) -> Iterator[Dict[str, Any]]:
+    """
+    Every matching job with its full result, read through a server-side
+    cursor (stream_results) in EXPORT_BATCH_ROWS chunks, so memory stays flat
+    however many rows match.
+    """
+    stmt, _ = _query(EXPORT_COLUMNS, **filters)
+    stmt = stmt.select_from(JOB_WITH_TEXTS)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_ROWS).execute(stmt)
+        for row in result:
+            yield dict(row._mapping)
+
+
+def _jsonable(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_ndjson(**filters) -> Iterator[str]:
+    for row in iter_jobs(**filters):
+        yield json.dumps({k: _jsonable(v) for k, v in row.items()}, ensure_ascii=False) + "\n"
+
+
+def export_csv(**filters) -> Iterator[str]:
+    header = [c.name for c in EXPORT_COLUMNS]
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=header)
+    writer.writeheader()
+    for i, row in enumerate(iter_jobs(**filters), 1):
+        writer.writerow({k: _jsonable(v) for k, v in row.items()})
+        if i % 100 == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
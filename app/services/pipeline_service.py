@@ -1,20 +1,48 @@
+import asyncio
 import json
+import time
 import uuid
-from typing import Dict, Any
+import zlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Dict, Any, Awaitable, Callable, Iterable, List, Optional, Tuple
 
-from app.core.llm_client import gen_json
-from app.services.search_service import get_contexts_for_pipeline
-from app.utils.file_io import path_by_id, read_file_text
+from pydantic import BaseModel, Field
+from sqlalchemy import and_, func, insert, or_, select, update
 
-from app.db.session import SessionLocal
-from app.db.models import JobResult
+from app.core.config import settings
+from app.core.events import publish_job_event
+from app.core.metrics import JOB_SECONDS, JOBS_FINISHED, STAGE_SECONDS, span
+
+from app.core.llm_client import agen_json_usage
+from app.core.tokenizer import truncate_tokens
+from app.services.checkpoint_service import clear_checkpoints, load_checkpoints, save_checkpoint
+from app.services.search_service import aget_contexts_for_pipeline, aselect_candidate_context, atriage_similarity
+from app.services.upload_service import read_doc_by_id
+
+from app.db.session import engine
+from app.db.models import JobArchive, JobResult, JobResultText
+from app.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+# ---------- prompt assembly (every variable section is capped in tokens) ----------
+def _fit(text: str, budget: int) -> str:
+    return truncate_tokens((text or "").strip(), budget)
+
+def _fit_json(d: dict, budget: int) -> dict:
+    """cap free-text fields of an earlier stage's output so the final prompt stays bounded"""
+    return {k: _fit(v, budget) if isinstance(v, str) else v for k, v in d.items()}
 
 def prompt_cv(cv_text: str, jd_ctx: str, rubric_ctx: str) -> str:
+    cv_text = _fit(cv_text, settings.CAND_CTX_TOKEN_BUDGET)
+    jd_ctx = _fit(jd_ctx, settings.PROMPT_BUDGET_JD)
+    rubric_ctx = _fit(rubric_ctx, settings.PROMPT_BUDGET_RUBRIC)
     return f"""
 You are an expert technical recruiter. Evaluate the following CV against the job description and the scoring rubric.
 
 CV:
-{cv_text[:3000]}
+{cv_text}
 
 Job Description Context:
 {jd_ctx}
@@ -30,11 +58,14 @@ Return STRICT JSON:
 """
 
 def prompt_proj(report_text: str, brief_ctx: str, rubric_ctx: str) -> str:
+    report_text = _fit(report_text, settings.CAND_CTX_TOKEN_BUDGET)
+    brief_ctx = _fit(brief_ctx, settings.PROMPT_BUDGET_BRIEF)
+    rubric_ctx = _fit(rubric_ctx, settings.PROMPT_BUDGET_RUBRIC)
     return f"""
 You are a senior backend/AI reviewer. Evaluate the candidate's project report against the case brief and the project rubric.
 
 Project Report:
-{report_text[:3000]}
+{report_text}
 
 Case Study Brief Context:
 {brief_ctx}
@@ -50,6 +81,8 @@ Return STRICT JSON:
 """
 
 def prompt_final(cvj: dict, projj: dict) -> str:
+    cvj = _fit_json(cvj, settings.PROMPT_BUDGET_STAGE_JSON)
+    projj = _fit_json(projj, settings.PROMPT_BUDGET_STAGE_JSON)
     return f"""
 You are writing a concise hiring panel note. Based on the two JSON blobs:
 
@@ -64,23 +97,151 @@ Return STRICT JSON:
 }}
 """
 
-def _update_job(job_id: str, **fields) -> None:
-    db = SessionLocal()
-    try:
-        row = db.query(JobResult).filter(JobResult.id == job_id).first()
-        if not row:
-            return
-        for k, v in fields.items():
-            setattr(row, k, v)
-        db.commit()
-    finally:
-        db.close()
+class CombinedEvaluation(BaseModel):
+    cv_match_rate: float = Field(ge=0, le=1)
+    cv_feedback: str
+    project_score: float = Field(ge=1, le=5)
+    project_feedback: str
+    overall_summary: str
+
+# Gemini structured output (OpenAPI subset); CombinedEvaluation still validates ranges
+COMBINED_GENERATION_CONFIG: Dict[str, Any] = {
+    "response_schema": {
+        "type": "OBJECT",
+        "properties": {
+            "cv_match_rate": {"type": "NUMBER"},
+            "cv_feedback": {"type": "STRING"},
+            "project_score": {"type": "NUMBER"},
+            "project_feedback": {"type": "STRING"},
+            "overall_summary": {"type": "STRING"},
+        },
+        "required": list(CombinedEvaluation.model_fields),
+    },
+}
+
+def prompt_combined(
+    cv_text: str, jd_ctx: str, cv_rubric_ctx: str,
+    report_text: str, brief_ctx: str, proj_rubric_ctx: str,
+) -> str:
+    cv_text = _fit(cv_text, settings.CAND_CTX_TOKEN_BUDGET)
+    report_text = _fit(report_text, settings.CAND_CTX_TOKEN_BUDGET)
+    jd_ctx = _fit(jd_ctx, settings.PROMPT_BUDGET_JD)
+    brief_ctx = _fit(brief_ctx, settings.PROMPT_BUDGET_BRIEF)
+    cv_rubric_ctx = _fit(cv_rubric_ctx, settings.PROMPT_BUDGET_RUBRIC)
+    proj_rubric_ctx = _fit(proj_rubric_ctx, settings.PROMPT_BUDGET_RUBRIC)
+    return f"""
+You are a hiring panel of an expert technical recruiter and a senior backend/AI reviewer.
+1. Evaluate the CV against the job description and the CV scoring rubric.
+2. Evaluate the project report against the case brief and the project rubric.
+3. Write a 3–5 sentence overall summary that states strengths, gaps, and a clear recommendation.
+
+CV:
+{cv_text}
+
+Job Description Context:
+{jd_ctx}
+
+CV Scoring Rubric:
+{cv_rubric_ctx}
+
+Project Report:
+{report_text}
+
+Case Study Brief Context:
+{brief_ctx}
+
+Project Scoring Rubric:
+{proj_rubric_ctx}
+
+Return STRICT JSON:
+{{
+  "cv_match_rate": <float 0..1>,
+  "cv_feedback": "<<=120 words concise feedback>",
+  "project_score": <number 1..5 allow .5>,
+  "project_feedback": "<<=120 words concise feedback>",
+  "overall_summary": "<3-5 sentences>"
+}}
+"""
+
+PIPELINE_MODES = ("staged", "combined")
+RESULT_KEYS = tuple(CombinedEvaluation.model_fields)
+
+ACTIVE_STATUSES = ("queued", "processing")
+TERMINAL_STATUSES = ("completed", "screened_out", "failed")
+TEXT_FIELDS = ("cv_feedback", "project_feedback", "overall_summary")
+
+# the queue lease runs on one worker's clock, updated_at on another's; the
+# slack keeps a redelivery at lease expiry from losing the stale check to skew
+CLAIM_SKEW = timedelta(seconds=5)
 
-def _to_response(row: JobResult) -> Dict[str, Any]:
+# result texts live in job_result_texts; rows finished before that table
+# existed (and not yet compacted) still carry them inline
+RESULT_TEXTS = {
+    f: func.coalesce(getattr(JobResultText, f), getattr(JobResult, f)).label(f) for f in TEXT_FIELDS
+}
+RESULT_TEXT_COLUMNS = tuple(RESULT_TEXTS.values())
+JOB_WITH_TEXTS = JobResult.__table__.outerjoin(JobResultText.__table__, JobResultText.job_id == JobResult.id)
+
+class ScreenedOut(Exception):
+    """Raised by the triage stage; ends the job as screened_out before any LLM call."""
+
+    def __init__(self, score: float):
+        super().__init__(f"similarity {score:.3f} below triage threshold {settings.TRIAGE_THRESHOLD}")
+        self.score = score
+
+def _update_job(job_id: str, only_from: Optional[Iterable[str]] = None, **fields) -> bool:
+    """
+    Single UPDATE ... WHERE id = :id [AND status IN (:only_from)].
+    Returns False when the row is missing or no longer in an allowed status.
+    """
+    stmt = update(JobResult).where(JobResult.id == job_id)
+    if only_from is not None:
+        stmt = stmt.where(JobResult.status.in_(list(only_from)))
+    with span("db_update"), engine.begin() as conn:
+        return conn.execute(stmt.values(**fields)).rowcount == 1
+
+def _complete_job(job_id: str, fields: Dict[str, Any], texts: Dict[str, Any]) -> bool:
+    """processing -> completed plus the result texts, in one transaction"""
+    stmt = (
+        update(JobResult)
+        .where(JobResult.id == job_id, JobResult.status == "processing")
+        .values(status="completed", **fields)
+    )
+    with span("db_update"), engine.begin() as conn:
+        if conn.execute(stmt).rowcount != 1:
+            return False
+        conn.execute(insert(JobResultText).values(job_id=job_id, **texts))
+    return True
+
+def claim_job(job_id: str) -> bool:
+    """
+    queued -> processing as a compare-and-set, so two workers handed the same
+    job (e.g. after a lease expired) cannot both run it. A job stuck in
+    processing longer than the visibility timeout is considered abandoned and
+    may be claimed again (give or take CLAIM_SKEW).
+    """
+    stale = datetime.utcnow() - timedelta(seconds=settings.QUEUE_VISIBILITY_TIMEOUT) + CLAIM_SKEW
+    stmt = (
+        update(JobResult)
+        .where(
+            JobResult.id == job_id,
+            or_(
+                JobResult.status == "queued",
+                and_(JobResult.status == "processing", JobResult.updated_at < stale),
+            ),
+        )
+        .values(status="processing")
+    )
+    with span("db_update"), engine.begin() as conn:
+        return conn.execute(stmt).rowcount == 1
+
+def _to_response(row) -> Dict[str, Any]:
     if not row:
         return {}
-    if row.status in ("queued", "processing"):
+    if row.status in ACTIVE_STATUSES:
         return {"id": row.id, "status": row.status}
+    if row.status == "screened_out":
+        return {"id": row.id, "status": "screened_out", "triage_score": row.triage_score}
     if row.status == "completed":
         return {
             "id": row.id,
@@ -99,68 +260,288 @@ def _require_nonempty(name: str, value: str, min_len: int = 20):
     if not value or len(value.strip()) < min_len:
         raise ValueError(f"{name} is empty/too short")
 
-def create_job(job_title: str, cv_id: str, report_id: str) -> str:
-    job_id = str(uuid.uuid4())
-    db = SessionLocal()
-    try:
-        row = JobResult(
+def create_job(job_title: str, cv_id: str, report_id: str, job_id: Optional[str] = None) -> str:
+    job_id = job_id or str(uuid.uuid4())
+    with engine.begin() as conn:
+        conn.execute(insert(JobResult).values(
             id=job_id,
             job_title=job_title,
             cv_id=cv_id,
             report_id=report_id,
             status="queued",
-        )
-        db.add(row)
-        db.commit()
-    finally:
-        db.close()
+        ))
     return job_id
 
-def run_pipeline(job_id: str, job_title: str, cv_id: str, report_id: str) -> None:
-    _update_job(job_id, status="processing")
+def _emit(job_id: str, status: str, **fields) -> None:
+    publish_job_event(job_id, _to_response(SimpleNamespace(id=job_id, status=status, **fields)))
+
+def fail_job(job_id: str, error: str) -> None:
+    if _update_job(job_id, only_from=ACTIVE_STATUSES, status="failed", error=error):
+        JOBS_FINISHED.labels(status="failed").inc()
+        _emit(job_id, "failed", error=error)
+
+def retry_job(job_id: str, restart: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    failed -> queued as a compare-and-set. Checkpoints are kept so the rerun
+    resumes after the last finished stage, unless restart is set. Returns the
+    job's inputs for re-enqueueing, or None if the job is not in failed state.
+    """
+    if not _update_job(job_id, only_from=("failed",), status="queued", error=None):
+        return None
+    if restart:
+        clear_checkpoints(job_id)
+    _emit(job_id, "queued")
+    cols = (JobResult.job_title, JobResult.cv_id, JobResult.report_id, JobResult.batch_id)
+    with engine.connect() as conn:
+        row = conn.execute(select(*cols).where(JobResult.id == job_id)).first()
+    return dict(row._mapping)
+
+Stage = Tuple[List[str], Callable[..., Awaitable[Any]]]
+
+async def _run_stages(
+    stages: Dict[str, Stage],
+    metrics: Optional[Dict[str, Dict[str, Any]]] = None,
+    done: Optional[Dict[str, Any]] = None,
+    on_complete: Optional[Callable[[str, Any], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Run a small DAG of async stages: each stage starts as soon as all of its
+    dependencies have finished and receives their results positionally.
+    Stages found in `done` (checkpoints of an earlier run) are not executed;
+    their stored result is used instead. on_complete is awaited with every
+    freshly computed result before dependents see it.
+    If metrics is given, each stage's own run time (excluding the wait for its
+    dependencies) is recorded there as metrics[name]["ms"].
+    """
+    done = done or {}
+    tasks: Dict[str, asyncio.Task] = {}
 
+    async def _run(name: str) -> Any:
+        if name in done:
+            if metrics is not None:
+                metrics.setdefault(name, {})["resumed"] = True
+            return done[name]
+        deps, fn = stages[name]
+        args = [await tasks[d] for d in deps]
+        t0 = time.perf_counter()
+        try:
+            result = await fn(*args)
+        finally:
+            elapsed = time.perf_counter() - t0
+            STAGE_SECONDS.labels(stage=name).observe(elapsed)
+            if metrics is not None:
+                metrics.setdefault(name, {})["ms"] = round(1000 * elapsed, 1)
+        if on_complete is not None:
+            await on_complete(name, result)
+        return result
+
+    for name in stages:
+        tasks[name] = asyncio.ensure_future(_run(name))
     try:
-        cv_path = path_by_id(cv_id)
-        report_path = path_by_id(report_id)
-        cv_text = read_file_text(cv_path)
-        report_text = read_file_text(report_path)
+        results = await asyncio.gather(*tasks.values())
+    except Exception:
+        for t in tasks.values():
+            t.cancel()
+        raise
+    return dict(zip(tasks, results))
+
+async def _read_doc(fid: str) -> Tuple[str, str]:
+    return await asyncio.to_thread(read_doc_by_id, fid)
+
+async def _evaluate(
+    job_title: str,
+    cv_id: str,
+    report_id: str,
+    use_cache: bool = True,
+    batch_id: Optional[str] = None,
+    metrics: Optional[Dict[str, Dict[str, Any]]] = None,
+    job_id: Optional[str] = None,
+    mode: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    mode "staged" (PIPELINE_MODE default) scores the CV and the report in two
+    parallel LLM calls and summarises them in a third; "combined" asks for all
+    five result fields in one schema-constrained call, validated by
+    CombinedEvaluation.
+    With job_id, every finished stage is checkpointed and stages that already
+    have a checkpoint are skipped, so a retried or redelivered job only pays
+    for the LLM calls that did not complete last time.
+    """
+    mode = mode or settings.PIPELINE_MODE
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"unknown pipeline mode '{mode}'")
+    metrics = {} if metrics is None else metrics
+    done: Dict[str, Any] = {}
+    on_complete = None
+    if job_id is not None:
+        done = await asyncio.to_thread(load_checkpoints, job_id)
+
+        async def on_complete(stage: str, result: Any) -> None:
+            await asyncio.to_thread(save_checkpoint, job_id, stage, result)
 
-        ctx = get_contexts_for_pipeline(job_title)
-        jd_ctx = ctx.get("jd_ctx", "")
-        cv_rb = ctx.get("cv_rubric_ctx", "")
-        brief = ctx.get("brief_ctx", "")
-        pr_rb = ctx.get("proj_rubric_ctx", "")
+    async def llm(stage: str, prompt: str, required: Tuple[str, ...], **kwargs) -> dict:
+        result, usage = await agen_json_usage(prompt, use_cache=use_cache, required=required, **kwargs)
+        metrics.setdefault(stage, {}).update(usage)
+        return result
 
+    async def triage(cv_doc: Tuple[str, str]) -> Dict[str, Any]:
+        cv_sha, cv_text = cv_doc
+        score = await atriage_similarity(cv_sha, cv_text, job_title)
+        if score is None:
+            return {"score": None}
+        score = round(score, 4)
+        metrics.setdefault("triage", {})["score"] = score
+        if score < settings.TRIAGE_THRESHOLD:
+            raise ScreenedOut(score)
+        return {"score": score}
+
+    # CV/report text is narrowed to the chunks closest to the JD/brief and the
+    # rubric, within CAND_CTX_TOKEN_BUDGET, instead of being cut at a fixed length
+    async def cv_inputs(cv_doc: Tuple[str, str], ctx: Dict[str, str]) -> Tuple[str, str, str]:
+        cv_sha, cv_text = cv_doc
+        jd_ctx, cv_rb = ctx.get("jd_ctx", ""), ctx.get("cv_rubric_ctx", "")
         _require_nonempty("CV text", cv_text)
         _require_nonempty("Job Description context", jd_ctx)
         _require_nonempty("CV Rubric context", cv_rb)
+        cv_focus = await aselect_candidate_context(cv_sha, cv_text, [job_title, jd_ctx, cv_rb])
+        return cv_focus, jd_ctx, cv_rb
+
+    async def report_inputs(report_doc: Tuple[str, str], ctx: Dict[str, str]) -> Tuple[str, str, str]:
+        report_sha, report_text = report_doc
+        brief, pr_rb = ctx.get("brief_ctx", ""), ctx.get("proj_rubric_ctx", "")
         _require_nonempty("Project Report text", report_text)
         _require_nonempty("Case Brief context", brief)
         _require_nonempty("Project Rubric context", pr_rb)
+        report_focus = await aselect_candidate_context(report_sha, report_text, [brief, pr_rb])
+        return report_focus, brief, pr_rb
+
+    async def cv_eval(cv_doc: Tuple[str, str], ctx: Dict[str, str], *_) -> dict:
+        return await llm("cv_json", prompt_cv(*await cv_inputs(cv_doc, ctx)), ("cv_match_rate", "cv_feedback"))
+
+    async def proj_eval(report_doc: Tuple[str, str], ctx: Dict[str, str], *_) -> dict:
+        return await llm("proj_json", prompt_proj(*await report_inputs(report_doc, ctx)), ("project_score", "project_feedback"))
+
+    async def final_eval(cv_json: dict, proj_json: dict) -> dict:
+        return await llm("final_json", prompt_final(cv_json, proj_json), ("overall_summary",))
+
+    async def combined_eval(cv_doc: Tuple[str, str], report_doc: Tuple[str, str], ctx: Dict[str, str], *_) -> dict:
+        cv, report = await asyncio.gather(cv_inputs(cv_doc, ctx), report_inputs(report_doc, ctx))
+        return await llm(
+            "combined_json", prompt_combined(*cv, *report), RESULT_KEYS,
+            generation_config=COMBINED_GENERATION_CONFIG, schema=CombinedEvaluation,
+        )
+
+    # with triage on, the LLM stages wait for it; reading the report and
+    # retrieving context still overlap with it
+    gate = ["triage"] if settings.TRIAGE_ENABLED else []
+    stages: Dict[str, Stage] = {
+        "cv_doc":      ([], lambda: _read_doc(cv_id)),
+        "report_doc":  ([], lambda: _read_doc(report_id)),
+        "ctx":         ([], lambda: aget_contexts_for_pipeline(job_title, batch_id=batch_id)),
+    }
+    if mode == "combined":
+        stages["combined_json"] = (["cv_doc", "report_doc", "ctx", *gate], combined_eval)
+    else:
+        stages["cv_json"] = (["cv_doc", "ctx", *gate], cv_eval)
+        stages["proj_json"] = (["report_doc", "ctx", *gate], proj_eval)
+        stages["final_json"] = (["cv_json", "proj_json"], final_eval)
+    if gate:
+        stages["triage"] = (["cv_doc"], triage)
+    return await _run_stages(stages, metrics, done=done, on_complete=on_complete)
+
+def _result_fields(out: Dict[str, Any]) -> Dict[str, Any]:
+    if "combined_json" in out:
+        return {k: out["combined_json"].get(k) for k in RESULT_KEYS}
+    cv_json, proj_json, final_json = out["cv_json"], out["proj_json"], out["final_json"]
+    return dict(
+        cv_match_rate=cv_json.get("cv_match_rate"),
+        cv_feedback=cv_json.get("cv_feedback"),
+        project_score=proj_json.get("project_score"),
+        project_feedback=proj_json.get("project_feedback"),
+        overall_summary=final_json.get("overall_summary"),
+    )
 
-        cv_json = gen_json(prompt_cv(cv_text, jd_ctx, cv_rb))
-        proj_json = gen_json(prompt_proj(report_text, brief, pr_rb))
-        final_json = gen_json(prompt_final(cv_json, proj_json))
-
-        _update_job(
-            job_id,
-            status="completed",
-            cv_match_rate=cv_json.get("cv_match_rate"),
-            cv_feedback=cv_json.get("cv_feedback"),
-            project_score=proj_json.get("project_score"),
-            project_feedback=proj_json.get("project_feedback"),
-            overall_summary=final_json.get("overall_summary"),
+def _usage_fields(metrics: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    # added to what earlier (failed) runs of the same job already spent
+    return dict(
+        input_tokens=func.coalesce(JobResult.input_tokens, 0) + sum(m.get("input_tokens", 0) for m in metrics.values()),
+        output_tokens=func.coalesce(JobResult.output_tokens, 0) + sum(m.get("output_tokens", 0) for m in metrics.values()),
+        stage_metrics=json.dumps(metrics, sort_keys=True),
+    )
+
+def run_pipeline(
+    job_id: str,
+    job_title: str,
+    cv_id: str,
+    report_id: str,
+    use_cache: bool = True,
+    batch_id: Optional[str] = None,
+) -> bool:
+    """
+    Run one queued job to a final status. Returns False without doing anything
+    if the job could not be claimed (another worker holds it, or it is already
+    finished or deleted); completion side effects are then not this caller's.
+    """
+    if not claim_job(job_id):
+        return False
+    _emit(job_id, "processing")
+
+    metrics: Dict[str, Dict[str, Any]] = {}
+    t0 = time.perf_counter()
+    try:
+        out = asyncio.run(_evaluate(
+            job_title, cv_id, report_id,
+            use_cache=use_cache, batch_id=batch_id, metrics=metrics, job_id=job_id,
+        ))
+        result = dict(
+            **_result_fields(out),
+            triage_score=(out.get("triage") or {}).get("score"),
             error=None,
         )
+        texts = {k: result.pop(k) for k in TEXT_FIELDS}
+        if _complete_job(job_id, {**result, **_usage_fields(metrics)}, texts):
+            clear_checkpoints(job_id)
+            JOBS_FINISHED.labels(status="completed").inc()
+            log.info("job completed", extra={"ms": round(1000 * (time.perf_counter() - t0), 1), "stages": metrics})
+            _emit(job_id, "completed", **result, **texts)
+
+    except ScreenedOut as e:
+        if _update_job(job_id, only_from=("processing",), status="screened_out", triage_score=e.score, **_usage_fields(metrics)):
+            clear_checkpoints(job_id)
+            JOBS_FINISHED.labels(status="screened_out").inc()
+            log.info("job screened out", extra={"ms": round(1000 * (time.perf_counter() - t0), 1), "triage_score": e.score})
+            _emit(job_id, "screened_out", triage_score=e.score)
 
     except Exception as e:
-        _update_job(job_id, status="failed", error=str(e))
+        # partial metrics are kept so expensive failures are visible too
+        if _update_job(job_id, only_from=("processing",), status="failed", error=str(e), **_usage_fields(metrics)):
+            JOBS_FINISHED.labels(status="failed").inc()
+            log.warning("job failed: %s", e, extra={"ms": round(1000 * (time.perf_counter() - t0), 1), "stages": metrics})
+            _emit(job_id, "failed", error=str(e))
+    finally:
+        JOB_SECONDS.observe(time.perf_counter() - t0)
+    return True
+
 
+_RESULT_COLUMNS = (
+    JobResult.id,
+    JobResult.status,
+    JobResult.error,
+    JobResult.triage_score,
+    JobResult.cv_match_rate,
+    JobResult.project_score,
+    *RESULT_TEXT_COLUMNS,
+)
 
 def get_job(job_id: str) -> Dict[str, Any]:
-    db = SessionLocal()
-    try:
-        row = db.query(JobResult).filter(JobResult.id == job_id).first()
-    finally:
-        db.close()
+    # Core select on a pooled connection: no Session/identity-map setup per poll
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(*_RESULT_COLUMNS).select_from(JOB_WITH_TEXTS).where(JobResult.id == job_id)
+        ).first()
+        if row is None:
+            archived = conn.execute(select(JobArchive.payload).where(JobArchive.id == job_id)).scalar()
+            if archived is not None:
+                # jobs past RETENTION_DAYS answer from the compressed archive
+                row = SimpleNamespace(**json.loads(zlib.decompress(archived)))
     return _to_response(row)
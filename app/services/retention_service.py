@@ -0,0 +1,275 @@
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import delete, exists, insert, or_, select, update
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.db.models import JobArchive, JobCheckpoint, JobResult, JobResultText, UploadAlias, UploadedFile
+from app.db.session import engine, init_db
+from app.services.pipeline_service import JOB_WITH_TEXTS, RESULT_TEXT_COLUMNS, TERMINAL_STATUSES, TEXT_FIELDS
+from app.utils.file_io import TEXT_DIR, abs_upload_path
+from app.utils.logger import configure_logging, get_logger
+
+log = get_logger(__name__)
+
+LOCK_KEY = f"{settings.QUEUE_NAME}:compaction"
+
+# every job_results column except the legacy inline texts, plus the texts from wherever they live
+_ARCHIVE_COLUMNS = tuple(c for c in JobResult.__table__.columns if c.name not in TEXT_FIELDS) + RESULT_TEXT_COLUMNS
+
+
+def _pause() -> None:
+    # short transactions with a gap in between, so polls and status updates never queue behind compaction
+    time.sleep(settings.COMPACTION_BATCH_PAUSE)
+
+
+# ---------- hot/cold split ----------
+def move_inline_texts(batch_size: int = settings.COMPACTION_BATCH_SIZE) -> int:
+    """Move result texts still stored inline in job_results into job_result_texts."""
+    inline = or_(*(getattr(JobResult, f).is_not(None) for f in TEXT_FIELDS))
+    moved, last_id = 0, ""
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(JobResult.id, *(getattr(JobResult, f) for f in TEXT_FIELDS))
+                .where(JobResult.id > last_id, inline)
+                .order_by(JobResult.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            ids = [r.id for r in rows]
+            have = set(conn.execute(select(JobResultText.job_id).where(JobResultText.job_id.in_(ids))).scalars())
+            new = [{"job_id": r.id, **{f: getattr(r, f) for f in TEXT_FIELDS}} for r in rows if r.id not in have]
+            if new:
+                conn.execute(insert(JobResultText), new)
+            conn.execute(
+                update(JobResult)
+                .where(JobResult.id.in_(ids))
+                .values(updated_at=JobResult.updated_at, **{f: None for f in TEXT_FIELDS})
+            )
+        moved += len(rows)
+        last_id = ids[-1]
+        _pause()
+    return moved
+
+
+# ---------- archival ----------
+def _archive_payload(row) -> bytes:
+    data = {k: v.isoformat() if isinstance(v, datetime) else v for k, v in row._mapping.items()}
+    return zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+def archive_jobs(days: int = settings.RETENTION_DAYS, batch_size: int = settings.COMPACTION_BATCH_SIZE) -> int:
+    """
+    Move finished jobs created more than `days` ago into job_results_archive
+    as compressed JSON, then batch-delete them (with their texts and
+    checkpoints) from the hot tables. Archived jobs stay readable through
+    get_job. Rows are locked with SKIP LOCKED, so a concurrent retry of a
+    failed job either wins or finds the job archived.
+    """
+    if days <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    stmt = (
+        select(*_ARCHIVE_COLUMNS)
+        .select_from(JOB_WITH_TEXTS)
+        .where(JobResult.status.in_(TERMINAL_STATUSES), JobResult.created_at < cutoff)
+        .order_by(JobResult.created_at)
+        .limit(batch_size)
+        .with_for_update(of=JobResult, skip_locked=True)
+    )
+    archived = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(stmt).all()
+            if not rows:
+                break
+            ids = [r.id for r in rows]
+            conn.execute(insert(JobArchive), [
+                {
+                    "id": r.id,
+                    "job_title": r.job_title,
+                    "status": r.status,
+                    "batch_id": r.batch_id,
+                    "created_at": r.created_at,
+                    "payload": _archive_payload(r),
+                }
+                for r in rows
+            ])
+            conn.execute(delete(JobCheckpoint).where(JobCheckpoint.job_id.in_(ids)))
+            conn.execute(delete(JobResultText).where(JobResultText.job_id.in_(ids)))
+            conn.execute(delete(JobResult).where(JobResult.id.in_(ids)))
+        archived += len(ids)
+        if len(rows) < batch_size:
+            break
+        _pause()
+    return archived
+
+
+def purge_archive(days: int = settings.ARCHIVE_RETENTION_DAYS, batch_size: int = settings.COMPACTION_BATCH_SIZE) -> int:
+    if days <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    purged = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(
+                select(JobArchive.id).where(JobArchive.archived_at < cutoff).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            conn.execute(delete(JobArchive).where(JobArchive.id.in_(ids)))
+        purged += len(ids)
+        if len(ids) < batch_size:
+            break
+        _pause()
+    return purged
+
+
+# ---------- uploads ----------
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def expire_uploads(days: int = settings.UPLOAD_RETENTION_DAYS, batch_size: int = settings.COMPACTION_BATCH_SIZE) -> int:
+    """
+    Delete uploads (registry row and file) older than `days` that no job in
+    job_results references, directly or through a legacy alias. A re-upload of the same bytes touches the file,
+    so only uploads whose file is also that old are removed.
+    """
+    if days <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    file_cutoff = time.time() - days * 86400
+    unreferenced = (
+        UploadedFile.created_at < cutoff,
+        ~exists().where(JobResult.cv_id == UploadedFile.id),
+        ~exists().where(JobResult.report_id == UploadedFile.id),
+        ~exists().where(
+            UploadAlias.upload_id == UploadedFile.id,
+            or_(JobResult.cv_id == UploadAlias.id, JobResult.report_id == UploadAlias.id),
+        ),
+    )
+    expired, after = 0, ""
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(UploadedFile.id, UploadedFile.path)
+                .where(UploadedFile.id > after, *unreferenced)
+                .order_by(UploadedFile.id)
+                .limit(batch_size)
+            ).all()
+        if not rows:
+            break
+        after = rows[-1].id
+        stale = [r for r in rows if _mtime(abs_upload_path(r.path)) < file_cutoff]
+        if stale:
+            with engine.begin() as conn:
+                # re-checked in the DELETE so a job created meanwhile keeps its file
+                deleted = conn.execute(
+                    delete(UploadedFile)
+                    .where(UploadedFile.id.in_([r.id for r in stale]), *unreferenced)
+                    .returning(UploadedFile.id)
+                ).scalars().all()
+                if deleted:
+                    conn.execute(delete(UploadAlias).where(UploadAlias.upload_id.in_(deleted)))
+            for r in stale:
+                if r.id in deleted:
+                    _remove(abs_upload_path(r.path))
+            expired += len(deleted)
+        _pause()
+    return expired
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0.0
+
+
+def _registered(column, values: List[str]) -> set:
+    if not values:
+        return set()
+    with engine.connect() as conn:
+        return set(conn.execute(select(column).where(column.in_(values))).scalars())
+
+
+def cleanup_upload_dir(grace: int = settings.UPLOAD_ORPHAN_GRACE) -> Dict[str, int]:
+    """
+    Remove files in UPLOAD_DIR that nothing can reach any more: abandoned
+    temp files, stored files without a registry row, and extracted-text cache
+    entries for content no upload has. Files younger than `grace` are skipped
+    (an upload in progress), as are top-level legacy files, which are adopted
+    on first access. Work is done one shard directory at a time.
+    """
+    out = {"tmp": 0, "orphans": 0, "text_cache": 0}
+    root = settings.UPLOAD_DIR
+    if not os.path.isdir(root):
+        return out
+    horizon = time.time() - grace
+    for dirpath, _, filenames in os.walk(root):
+        rel = os.path.relpath(dirpath, root)
+        if rel == ".":
+            continue
+        old = [f for f in filenames if _mtime(os.path.join(dirpath, f)) < horizon]
+        if not old:
+            continue
+        top = rel.split(os.sep, 1)[0]
+        if top == ".tmp":
+            out["tmp"] += sum(_remove(os.path.join(dirpath, f)) for f in old)
+        elif top == TEXT_DIR:
+            shas = {f[: -len(".txt")]: f for f in old if f.endswith(".txt")}
+            known = _registered(UploadedFile.sha256, list(shas))
+            out["text_cache"] += sum(_remove(os.path.join(dirpath, f)) for sha, f in shas.items() if sha not in known)
+        else:
+            # write_atomic leftovers
+            out["tmp"] += sum(_remove(os.path.join(dirpath, f)) for f in old if f.endswith(".tmp"))
+            paths = {os.path.join(rel, f): f for f in old if not f.endswith(".tmp")}
+            known = _registered(UploadedFile.path, list(paths))
+            out["orphans"] += sum(_remove(os.path.join(dirpath, f)) for p, f in paths.items() if p not in known)
+    return out
+
+
+# ---------- compaction ----------
+def compact() -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    out: Dict[str, Any] = {
+        "texts_moved": move_inline_texts(),
+        "archived": archive_jobs(),
+        "archive_purged": purge_archive(),
+        "uploads_expired": expire_uploads(),
+        **{f"files_{k}": v for k, v in cleanup_upload_dir().items()},
+    }
+    log.info("compaction finished", extra={"ms": round(1000 * (time.perf_counter() - t0), 1), **out})
+    return out
+
+
+def compact_if_due() -> bool:
+    """Run compact() on at most one worker per COMPACTION_INTERVAL (Redis lock that simply expires)."""
+    if settings.COMPACTION_INTERVAL <= 0:
+        return False
+    if not get_redis().set(LOCK_KEY, os.getpid(), nx=True, ex=settings.COMPACTION_INTERVAL):
+        return False
+    compact()
+    return True
+
+
+def main() -> None:
+    configure_logging()
+    init_db()
+    print(json.dumps(compact(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
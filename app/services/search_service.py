@@ -1,16 +1,242 @@
-from typing import List, Optional, Dict, Any
-from app.core.redis_client import knn_search, ensure_index_and_seed
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.embedding_client import embed_texts
+from app.core.redis_client import get_redis, INDEX_NAME, embed_query
+from app.core.metrics import span
+from app.core.retriever import get_retriever, knn_search
 from app.utils.file_io import join_ctx
+from app.core.tokenizer import count_tokens, truncate_tokens
+from app.utils.helpers import chunk_sections
+from app.utils.logger import get_logger
+
+# queries that do not depend on the job title; embedded once by warm_up()
+FIXED_QUERIES = ("cv rubric", "case study brief", "project rubric")
+
+CtxKey = Tuple[str, str, int, int]  # (query, doc_type, k, index version)
+
+_ctx_cache: "OrderedDict[CtxKey, str]" = OrderedDict()
+_ctx_lock = threading.Lock()
+_CTX_CACHE_MAX = 1024
+_ctx_stats = {"hits": 0, "misses": 0}
+
+log = get_logger(__name__)
+
+def ensure_index_and_seed() -> None:
+    get_retriever().ensure_ready()
+
+def get_index_version() -> int:
+    return get_retriever().version()
+
+def warm_up() -> None:
+    ensure_index_and_seed()
+    for q in FIXED_QUERIES:
+        embed_query(q)
 
 def search_ctx(query: str, k: int, types: Optional[List[str]] = None) -> str:
     ensure_index_and_seed()
     rows = knn_search(query, k=k, types=types)
     return join_ctx(rows)
 
-def get_contexts_for_pipeline(job_title: str) -> Dict[str, str]:
+def _context_queries(job_title: str) -> Dict[str, Dict[str, Any]]:
+    return {
+        "jd_ctx":          {"query": job_title,          "k": 3, "types": ["job_description"]},
+        "cv_rubric_ctx":   {"query": "cv rubric",        "k": 2, "types": ["cv_rubric"]},
+        "brief_ctx":       {"query": "case study brief", "k": 2, "types": ["case_brief"]},
+        "proj_rubric_ctx": {"query": "project rubric",   "k": 2, "types": ["project_rubric"]},
+    }
+
+def _ctx_key(q: Dict[str, Any], version: int) -> CtxKey:
+    return (q["query"], ",".join(q["types"]), q["k"], version)
+
+def _cache_get(key: CtxKey) -> Optional[str]:
+    with _ctx_lock:
+        val = _ctx_cache.get(key)
+        if val is not None:
+            _ctx_cache.move_to_end(key)
+            _ctx_stats["hits"] += 1
+        else:
+            _ctx_stats["misses"] += 1
+        return val
+
+def _cache_put(key: CtxKey, val: str) -> None:
+    with _ctx_lock:
+        _ctx_cache[key] = val
+        _ctx_cache.move_to_end(key)
+        while len(_ctx_cache) > _CTX_CACHE_MAX:
+            _ctx_cache.popitem(last=False)
+
+def ctx_cache_stats() -> Dict[str, float]:
+    with _ctx_lock:
+        hits, misses, entries = _ctx_stats["hits"], _ctx_stats["misses"], len(_ctx_cache)
+    lookups = hits + misses
     return {
-        "jd_ctx":         search_ctx(job_title, k=3, types=["job_description"]),
-        "cv_rubric_ctx":  search_ctx("cv rubric", k=2, types=["cv_rubric"]),
-        "brief_ctx":      search_ctx("case study brief", k=2, types=["case_brief"]),
-        "proj_rubric_ctx":search_ctx("project rubric", k=2, types=["project_rubric"]),
+        "hits_total": hits,
+        "misses_total": misses,
+        "entries": entries,
+        "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
     }
+
+def _fill(q: Dict[str, Any], version: int) -> str:
+    val = join_ctx(knn_search(q["query"], k=q["k"], types=q["types"]))
+    _cache_put(_ctx_key(q, version), val)
+    return val
+
+def _lookup(q: Dict[str, Any], version: int) -> str:
+    val = _cache_get(_ctx_key(q, version))
+    return val if val is not None else _fill(q, version)
+
+def get_contexts_for_pipeline(job_title: str) -> Dict[str, str]:
+    """
+    Cached per (query, doc_type, k, index version). A warm call costs one
+    Redis GET for the version and no embedding or KNN work.
+    """
+    ensure_index_and_seed()
+    version = get_index_version()
+    return {name: _lookup(q, version) for name, q in _context_queries(job_title).items()}
+
+def _batch_ctx_key(batch_id: str) -> str:
+    return f"{INDEX_NAME}:batch_ctx:{batch_id}"
+
+async def aget_contexts_for_pipeline(job_title: str, batch_id: Optional[str] = None) -> Dict[str, str]:
+    """
+    With batch_id, the first job of a batch publishes its contexts to Redis and
+    every other job (on any worker) reuses them, so a whole batch is scored
+    against the same JD/rubric text even if ground truth is re-ingested mid-run.
+    """
+    if batch_id:
+        raw = await asyncio.to_thread(get_redis().get, _batch_ctx_key(batch_id))
+        if raw:
+            return json.loads(raw)
+    ctx = await _aget_contexts(job_title)
+    if batch_id:
+        key = _batch_ctx_key(batch_id)
+        stored = await asyncio.to_thread(get_redis().set, key, json.dumps(ctx), ex=settings.BATCH_CONTEXT_TTL, nx=True)
+        if not stored:
+            raw = await asyncio.to_thread(get_redis().get, key)
+            if raw:
+                return json.loads(raw)
+    return ctx
+
+async def _aget_contexts(job_title: str) -> Dict[str, str]:
+    await asyncio.to_thread(ensure_index_and_seed)
+    version = await asyncio.to_thread(get_index_version)
+    queries = _context_queries(job_title)
+    out = {name: _cache_get(_ctx_key(q, version)) for name, q in queries.items()}
+    misses = [name for name, v in out.items() if v is None]
+    if misses:
+        vals = await asyncio.gather(*(asyncio.to_thread(_fill, queries[n], version) for n in misses))
+        out.update(zip(misses, vals))
+    return out
+
+# ---------- candidate documents ----------
+def _candidate_chunks(text: str) -> List[str]:
+    return chunk_sections(text, settings.CAND_CHUNK_CHARS, overlap=100)
+
+def _index_candidate(doc_id: str, text: str) -> List[str]:
+    chunks = _candidate_chunks(text)
+    retriever = get_retriever()
+    if chunks and retriever.candidate_chunk_count(doc_id) != len(chunks):
+        retriever.write_candidate_chunks(doc_id, chunks, embed_texts(chunks))
+    return chunks
+
+def _budget_head(chunks: List[str], budget: int) -> str:
+    if not chunks:
+        return ""
+    out, used = [], 0
+    for c in chunks:
+        cost = count_tokens(c)
+        if used + cost > budget:
+            break
+        out.append(c)
+        used += cost
+    return "\n\n".join(out) if out else truncate_tokens(chunks[0], budget)
+
+def select_candidate_context(
+    doc_id: str,
+    text: str,
+    queries: List[str],
+    k: int = settings.CAND_TOP_K,
+    budget: int = settings.CAND_CTX_TOKEN_BUDGET,
+) -> str:
+    """
+    The parts of a CV/report most relevant to `queries` (JD, rubric, ...).
+    The document is chunked by section and embedded once per content hash;
+    each query retrieves its top-k chunks, and the best-scoring chunks are
+    kept until `budget` tokens are used, then re-emitted in document order.
+    A document that already fits the budget is passed through whole.
+    """
+    text = (text or "").strip()
+    if count_tokens(text) <= budget:
+        return text
+    chunks = _index_candidate(doc_id, text)
+    try:
+        best: Dict[int, float] = {}
+        for q in queries:
+            if not q.strip():
+                continue
+            for hit in get_retriever().knn_candidate(doc_id, embed_query(q), k):
+                best[hit["chunk"]] = min(best.get(hit["chunk"], 2.0), hit["score"])
+    except Exception as e:
+        log.warning("candidate retrieval failed for %s: %s; using document head", doc_id, e)
+        return _budget_head(chunks, budget)
+
+    picked, used = [], 0
+    for idx in sorted(best, key=best.get):  # cosine distance: lower is closer
+        if idx >= len(chunks):
+            continue
+        cost = count_tokens(chunks[idx])
+        if used + cost > budget:
+            continue
+        picked.append(idx)
+        used += cost
+    if not picked:
+        return _budget_head(chunks, budget)
+    return "\n\n".join(chunks[i] for i in sorted(picked))
+
+async def aselect_candidate_context(doc_id: str, text: str, queries: List[str]) -> str:
+    return await asyncio.to_thread(select_candidate_context, doc_id, text, queries)
+
+# ---------- triage ----------
+def triage_similarity(doc_id: str, text: str, job_title: str) -> Optional[float]:
+    """
+    How well a CV covers the job description, without an LLM: the CV chunks
+    and the top TRIAGE_JD_K JD chunks for job_title are compared in one
+    matrix product, and for every JD chunk the closest CV chunk counts.
+    Returns the mean of those cosine similarities, or None when there is
+    nothing to compare. CV chunk vectors already in the candidate index are
+    reused; new ones are stored there, so selecting CV context later does
+    not embed them again.
+    """
+    chunks = _candidate_chunks((text or "").strip())
+    if not chunks:
+        return None
+    ensure_index_and_seed()
+    jd_rows = knn_search(job_title, k=settings.TRIAGE_JD_K, types=["job_description"])
+    if not jd_rows:
+        return None
+    retriever = get_retriever()
+    vecs = None
+    if retriever.candidate_chunk_count(doc_id) == len(chunks):
+        # a re-submitted CV or a retried job finds its chunk vectors already indexed
+        vecs = retriever.candidate_vectors(doc_id, chunks)
+    fresh = vecs is None
+    with span("triage"):
+        # JD chunk texts repeat across every job for the opening; embed_query caches them
+        jd = np.asarray([embed_query(r["text"]) for r in jd_rows], dtype=np.float32)
+        if fresh:
+            vecs = np.asarray(embed_texts(chunks), dtype=np.float32)
+        sims = vecs @ jd.T  # (cv chunks, jd chunks)
+        score = float(sims.max(axis=0).mean())
+    if fresh:
+        retriever.write_candidate_chunks(doc_id, chunks, vecs)
+    return score
+
+async def atriage_similarity(doc_id: str, text: str, job_title: str) -> Optional[float]:
+    return await asyncio.to_thread(triage_similarity, doc_id, text, job_title)
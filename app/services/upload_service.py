@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models import UploadAlias, UploadedFile
+from app.utils.file_io import (
+    abs_upload_path,
+    legacy_relpath,
+    read_text_cached,
+    sha256_file,
+    shard_relpath,
+)
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+def _by_sha(db, sha: str) -> Optional[UploadedFile]:
+    return db.query(UploadedFile).filter(UploadedFile.sha256 == sha).first()
+
+
+def register_upload(
+    fid: str,
+    relpath: str,
+    sha: str,
+    size: int,
+    filename: Optional[str] = None,
+    content_type: Optional[str] = None,
+    drop_duplicate: bool = True,
+) -> str:
+    """
+    Insert the registry row for a stored file and return the canonical id.
+    If the same bytes were registered first (possibly by a concurrent request)
+    the existing id is returned and, with drop_duplicate, our copy is removed.
+    """
+    db = SessionLocal()
+    try:
+        db.add(UploadedFile(
+            id=fid,
+            path=relpath,
+            filename=filename,
+            content_type=content_type,
+            size=size,
+            sha256=sha,
+        ))
+        db.commit()
+        return fid
+    except IntegrityError:
+        db.rollback()
+        existing = _by_sha(db, sha)
+        if existing is None:
+            raise
+        if drop_duplicate and existing.path != relpath:
+            try:
+                os.remove(abs_upload_path(relpath))
+            except FileNotFoundError:
+                pass
+        return existing.id
+    finally:
+        db.close()
+
+
+def find_by_sha(sha: str) -> Optional[str]:
+    """
+    Id of an existing upload with these bytes. Its file is touched, so
+    retention (UPLOAD_RETENTION_DAYS) counts from the last time it was uploaded.
+    """
+    db = SessionLocal()
+    try:
+        row = _by_sha(db, sha)
+        if row is None:
+            return None
+        try:
+            os.utime(abs_upload_path(row.path))
+        except OSError:
+            pass
+        return row.id
+    finally:
+        db.close()
+
+
+async def save_upload_stream(upload: UploadFile, max_bytes: Optional[int] = None) -> Tuple[str, int]:
+    """
+    Stream an UploadFile to disk in UPLOAD_CHUNK_SIZE pieces, hashing as it
+    goes, so memory stays flat regardless of file size. Returns (file id, size).
+    """
+    limit = max_bytes if max_bytes is not None else settings.MAX_UPLOAD_FILE_BYTES
+    tmp = abs_upload_path(os.path.join(".tmp", uuid.uuid4().hex))
+    await asyncio.to_thread(Path(os.path.dirname(tmp)).mkdir, parents=True, exist_ok=True)
+
+    h, size = hashlib.sha256(), 0
+    f = await asyncio.to_thread(open, tmp, "wb")
+    try:
+        while True:
+            chunk = await upload.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                raise UploadTooLargeError(f"{upload.filename} exceeds {limit} bytes")
+            h.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.remove, tmp)
+        raise
+    await asyncio.to_thread(f.close)
+
+    sha = h.hexdigest()
+    existing = await asyncio.to_thread(find_by_sha, sha)
+    if existing:
+        await asyncio.to_thread(os.remove, tmp)
+        return existing, size
+
+    fid = str(uuid.uuid4())
+    _, ext = os.path.splitext(upload.filename or "")
+    relpath = shard_relpath(fid, ext or ".txt")
+    dest = abs_upload_path(relpath)
+    await asyncio.to_thread(Path(os.path.dirname(dest)).mkdir, parents=True, exist_ok=True)
+    await asyncio.to_thread(os.replace, tmp, dest)
+    fid = await asyncio.to_thread(
+        register_upload, fid, relpath, sha, size, upload.filename, upload.content_type
+    )
+    return fid, size
+
+
+def _lookup(fid: str) -> Tuple[str, str]:
+    # one primary-key read, deliberately not memoized: uploads expire
+    # (UPLOAD_RETENTION_DAYS) in another process, and a stale cache would
+    # keep admitting ids whose file is gone
+    columns = (UploadedFile.path, UploadedFile.sha256)
+    db = SessionLocal()
+    try:
+        row = db.query(*columns).filter(UploadedFile.id == fid).first()
+        if row is None:
+            row = (
+                db.query(*columns)
+                .join(UploadAlias, UploadAlias.upload_id == UploadedFile.id)
+                .filter(UploadAlias.id == fid)
+                .first()
+            )
+    finally:
+        db.close()
+    if row:
+        return row.path, row.sha256
+
+    # flat-layout upload from before the registry: adopt it on first access
+    relpath = legacy_relpath(fid)
+    if relpath is None:
+        raise FileNotFoundError(f"file id not found: {fid}")
+    path = abs_upload_path(relpath)
+    sha = sha256_file(path)
+    canonical = register_upload(fid, relpath, sha, os.path.getsize(path), filename=relpath, drop_duplicate=False)
+    if canonical != fid:
+        # same bytes as an upload registered first: remember the mapping so
+        # the file is not hashed again on every lookup
+        _add_alias(fid, canonical)
+    return relpath, sha
+
+
+def _add_alias(fid: str, upload_id: str) -> None:
+    db = SessionLocal()
+    try:
+        db.add(UploadAlias(id=fid, upload_id=upload_id))
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # a concurrent lookup recorded it first
+    finally:
+        db.close()
+
+
+def path_by_id(fid: str) -> str:
+    path = abs_upload_path(_lookup(fid)[0])
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"file for id {fid} is gone")
+    return path
+
+
+def sha_by_id(fid: str) -> str:
+    return _lookup(fid)[1]
+
+
+def read_text_by_id(fid: str) -> str:
+    return read_doc_by_id(fid)[1]
+
+
+def read_doc_by_id(fid: str) -> Tuple[str, str]:
+    """(content sha256, extracted text) for an upload"""
+    relpath, sha = _lookup(fid)
+    return sha, read_text_cached(abs_upload_path(relpath), sha)
@@ -0,0 +1,122 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Set, Union
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class UnsafeWebhookError(ValueError):
+    """callback_url points somewhere the service must not POST to."""
+
+
+def _csv(value: str) -> Set[str]:
+    return {v.strip().lower() for v in value.split(",") if v.strip()}
+
+
+def _public(ip: Union[ipaddress.IPv4Address, ipaddress.IPv6Address]) -> bool:
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_url(url: str) -> None:
+    """
+    Scheme/host allowlists and literal-IP check, without DNS; run when a
+    callback_url is accepted. Raises UnsafeWebhookError.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme.lower() not in _csv(settings.WEBHOOK_ALLOWED_SCHEMES):
+        raise UnsafeWebhookError(f"callback scheme '{parts.scheme}' is not allowed")
+    if not host:
+        raise UnsafeWebhookError("callback_url has no host")
+    allowed = _csv(settings.WEBHOOK_ALLOWED_HOSTS)
+    if allowed and not any(host == a or (a.startswith(".") and host.endswith(a)) for a in allowed):
+        raise UnsafeWebhookError(f"callback host '{host}' is not allowed")
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        return
+    if not settings.WEBHOOK_ALLOW_PRIVATE and not _public(ip):
+        raise UnsafeWebhookError(f"callback address {ip} is not public")
+
+
+def _check_resolved(url: str) -> None:
+    """Every address the host resolves to must be public; checked again on each attempt."""
+    if settings.WEBHOOK_ALLOW_PRIVATE:
+        return
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme.lower() == "https" else 80)
+    for *_, sockaddr in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP):
+        ip = ipaddress.ip_address(sockaddr[0].split("%", 1)[0])
+        if not _public(ip):
+            raise UnsafeWebhookError(f"callback host '{parts.hostname}' resolves to non-public {ip}")
+
+
+def _sign(body: bytes) -> Dict[str, str]:
+    if not settings.WEBHOOK_SECRET:
+        return {}
+    digest = hmac.new(settings.WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    return {"X-Signature-SHA256": digest}
+
+
+def deliver(url: str, payload: Dict[str, Any]) -> bool:
+    """
+    POST payload to url, retrying network errors, 429 and 5xx with exponential
+    backoff plus jitter. Other 4xx responses are treated as final, and so is a
+    url that fails check_url or resolves to a non-public address. Redirects
+    are not followed.
+    """
+    try:
+        check_url(url)
+    except UnsafeWebhookError as e:
+        log.warning("webhook %s refused: %s", url, e)
+        return False
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    headers = {"Content-Type": "application/json", **_sign(body)}
+    for attempt in range(1, settings.WEBHOOK_MAX_ATTEMPTS + 1):
+        try:
+            _check_resolved(url)
+            resp = httpx.post(url, content=body, headers=headers, timeout=settings.WEBHOOK_TIMEOUT)
+            if resp.status_code < 400:
+                return True
+            if resp.status_code < 500 and resp.status_code != 429:
+                log.warning("webhook %s rejected with %s; not retrying", url, resp.status_code)
+                return False
+            err = f"HTTP {resp.status_code}"
+        except UnsafeWebhookError as e:
+            log.warning("webhook %s refused: %s", url, e)
+            return False
+        except (httpx.HTTPError, OSError) as e:
+            err = str(e)
+        if attempt < settings.WEBHOOK_MAX_ATTEMPTS:
+            delay = settings.WEBHOOK_BACKOFF_BASE * (2 ** (attempt - 1))
+            time.sleep(delay + random.uniform(0, delay))
+    log.warning("webhook %s failed after %d attempts: %s", url, settings.WEBHOOK_MAX_ATTEMPTS, err)
+    return False
+
+
+def deliver_async(url: str, payload: Dict[str, Any]) -> None:
+    """Fire-and-forget on a small pool so retries never hold a job slot."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:  # worker threads finish jobs concurrently; build one pool
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.WEBHOOK_WORKERS, thread_name_prefix="webhook")
+    _executor.submit(deliver, url, payload)
@@ -0,0 +1,24 @@
+"""Stand-ins for external services, shared by app.bench and the pytest suite."""
+import zlib
+from typing import List
+
+
+class HashEmbedder:
+    """Deterministic bag-of-words hashing embedder with the SentenceTransformer surface we use."""
+
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True, **_):
+        import numpy as np
+
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for tok in text.lower().split():
+                out[i, zlib.crc32(tok.encode()) % self.dim] += 1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.core.llm_client import agen_json_usage
+from app.core.llm_providers import LLMProvider, LLMResponse
+from app.services.pipeline_service import CombinedEvaluation, create_job, get_job, run_pipeline
+
+CV = """Jane Doe
+Backend engineer
+
+SKILLS
+PYTHON, SQL, DOCKER, REDIS, FASTAPI
+
+EXPERIENCE
+Built and operated Python backend services with FastAPI, Postgres and Redis queues.
+Designed retrieval-augmented generation pipelines with embeddings and LLM scoring.
+"""
+
+REPORT = """# Approach
+A FastAPI service with a Redis-backed job queue and a worker pool.
+
+# Results
+Evaluations run asynchronously; retries and checkpoints make failures cheap.
+"""
+
+
+@pytest.fixture
+def job(upload):
+    cv_id, report_id = upload(CV), upload(REPORT)
+    job_id = create_job("Backend Engineer", cv_id, report_id)
+    return job_id, cv_id, report_id
+
+
+@pytest.mark.parametrize("mode", ["staged", "combined"])
+def test_pipeline_completes(job, mode, monkeypatch):
+    monkeypatch.setattr(settings, "PIPELINE_MODE", mode)
+    job_id, cv_id, report_id = job
+    assert run_pipeline(job_id, "Backend Engineer", cv_id, report_id) is True
+    out = get_job(job_id)
+    assert out["status"] == "completed", out
+    result = out["result"]
+    assert set(result) == set(CombinedEvaluation.model_fields)
+    assert 0 <= result["cv_match_rate"] <= 1
+    assert 1 <= result["project_score"] <= 5
+    assert result["overall_summary"]
+
+
+def test_triage_screens_out_before_llm(job, monkeypatch):
+    monkeypatch.setattr(settings, "TRIAGE_ENABLED", True)
+    monkeypatch.setattr(settings, "TRIAGE_THRESHOLD", 1.01)  # cosine similarity never reaches it
+    job_id, cv_id, report_id = job
+    run_pipeline(job_id, "Backend Engineer", cv_id, report_id)
+    out = get_job(job_id)
+    assert out["status"] == "screened_out"
+    assert out["triage_score"] < 1.01
+
+
+def test_missing_upload_fails_job(upload):
+    cv_id = upload(CV)
+    job_id = create_job("Backend Engineer", cv_id, "no-such-upload")
+    run_pipeline(job_id, "Backend Engineer", cv_id, "no-such-upload")
+    out = get_job(job_id)
+    assert out["status"] == "failed"
+    assert "no-such-upload" in out["error"]
+
+
+class _ScriptedProvider(LLMProvider):
+    name = "scripted"
+
+    def __init__(self, answers):
+        super().__init__("scripted")
+        self.answers = list(answers)
+        self.prompts = []
+
+    async def generate(self, prompt, generation_config=None, timeout=None):
+        self.prompts.append(prompt)
+        return LLMResponse(text=self.answers.pop(0), input_tokens=10, output_tokens=5)
+
+
+def test_schema_violation_is_reasked(monkeypatch):
+    from app.core import llm_client
+
+    bad = '{"cv_match_rate": 3, "cv_feedback": "x", "project_score": 4, "project_feedback": "y", "overall_summary": "z"}'
+    good = bad.replace('"cv_match_rate": 3', '"cv_match_rate": 0.7')
+    provider = _ScriptedProvider([bad, good])
+    monkeypatch.setattr(llm_client, "get_provider", lambda: provider)
+
+    result, usage = asyncio.run(agen_json_usage("Return STRICT JSON", use_cache=False, schema=CombinedEvaluation))
+    assert result["cv_match_rate"] == 0.7
+    assert len(provider.prompts) == 2
+    assert "cv_match_rate" in provider.prompts[1]  # the re-ask quotes the problem
+
+
+class _HangingProvider(LLMProvider):
+    name = "hanging"
+
+    def __init__(self):
+        super().__init__("hanging")
+        self.started = asyncio.Event()
+
+    async def generate(self, prompt, generation_config=None, timeout=None):
+        self.started.set()
+        await asyncio.sleep(3600)
+
+
+def test_cancelled_probe_frees_the_breaker(monkeypatch):
+    from app.core import llm_client
+
+    breaker = llm_client.CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()  # open; with no cooldown the next call is the half-open probe
+    provider = _HangingProvider()
+    monkeypatch.setattr(llm_client, "breaker", breaker)
+    monkeypatch.setattr(llm_client, "get_provider", lambda: provider)
+
+    async def cancel_probe():
+        usage = {"input_tokens": 0, "output_tokens": 0, "attempts": 0}
+        deadline = asyncio.get_running_loop().time() + 60
+        task = asyncio.create_task(llm_client._generate("prompt", {}, deadline, usage))
+        await provider.started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+    assert breaker.allow() is True  # a new probe is let through
@@ -0,0 +1,68 @@
+from app.services.search_service import _budget_head
+from app.utils.helpers import chunk_sections, chunk_text, split_sections
+
+
+# ---------- split_sections ----------
+def test_caps_body_line_is_not_a_heading():
+    text = "SKILLS\nPYTHON, SQL, DOCKER\nEXPERIENCE\nBackend engineer at ACME, 2019-2024"
+    assert split_sections(text) == [
+        ("SKILLS", "PYTHON, SQL, DOCKER"),
+        ("EXPERIENCE", "Backend engineer at ACME, 2019-2024"),
+    ]
+
+
+def test_heading_without_body_merges_into_next():
+    text = "Experience\nProjects:\nBuilt a RAG pipeline"
+    assert split_sections(text) == [("Experience / Projects", "Built a RAG pipeline")]
+
+
+def test_markdown_headings_and_preamble():
+    text = "Jane Doe\njane@example.com\n\n## Architecture\nFastAPI + Redis queue\n# Results\nAll green"
+    assert split_sections(text) == [
+        ("", "Jane Doe\njane@example.com"),
+        ("Architecture", "FastAPI + Redis queue"),
+        ("Results", "All green"),
+    ]
+
+
+def test_label_with_content_stays_body():
+    assert split_sections("Skills: Python, SQL\nLanguages: English") == [
+        ("", "Skills: Python, SQL\nLanguages: English"),
+    ]
+
+
+def test_trailing_heading_without_body_is_dropped():
+    assert split_sections("Summary\nHands-on engineer\nReferences") == [("Summary", "Hands-on engineer")]
+
+
+def test_empty_text():
+    assert split_sections("") == []
+    assert split_sections(None) == []
+
+
+def test_chunk_sections_prefixes_heading():
+    assert chunk_sections("SKILLS\nPYTHON, SQL") == ["[SKILLS]\nPYTHON, SQL"]
+
+
+# ---------- chunk_text ----------
+def test_chunk_text_respects_max_chars():
+    text = "\n\n".join(f"Paragraph {i}. " + "word " * 60 for i in range(20))
+    chunks = chunk_text(text, max_chars=400, overlap=50)
+    assert len(chunks) > 1
+    assert all(len(c) <= 400 for c in chunks)
+    assert "Paragraph 0." in chunks[0] and "Paragraph 19." in chunks[-1]
+
+
+def test_chunk_text_short_and_empty():
+    assert chunk_text("  short text  ") == ["short text"]
+    assert chunk_text("") == []
+
+
+# ---------- candidate context fallback ----------
+def test_budget_head_without_chunks():
+    assert _budget_head([], 100) == ""
+
+
+def test_budget_head_truncates_first_chunk_over_budget():
+    out = _budget_head(["word " * 500, "tail"], 20)
+    assert out and len(out) < len("word " * 500)
@@ -0,0 +1,86 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import create_app
+
+API = settings.API_V1_STR
+
+
+@pytest.fixture
+def client():
+    with TestClient(create_app()) as c:
+        yield c
+
+
+@pytest.fixture
+def ids(client):
+    files = {
+        "cv": ("cv.txt", b"SKILLS\nPYTHON, SQL\n\nEXPERIENCE\nBackend engineer, five years.", "text/plain"),
+        "report": ("report.txt", b"# Approach\nFastAPI service with a Redis queue and workers.", "text/plain"),
+    }
+    resp = client.post(f"{API}/evaluate/upload", files=files)
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def _evaluate(client, ids, **extra):
+    return client.post(f"{API}/evaluate", json={"job_title": "Backend Engineer", **ids, **extra})
+
+
+def test_duplicate_request_returns_existing_job(client, ids):
+    first = _evaluate(client, ids).json()
+    again = _evaluate(client, ids).json()
+    assert first["status"] == "queued"
+    assert again["id"] == first["id"] and again["deduplicated"] is True
+    assert client.get(f"{API}/evaluate/result/{first['id']}").json()["status"] == "queued"
+
+
+def test_duplicate_is_answered_even_when_queue_is_full(client, ids, monkeypatch):
+    first = _evaluate(client, ids).json()
+    monkeypatch.setattr(settings, "QUEUE_MAX_DEPTH", 1)
+    again = _evaluate(client, ids)
+    assert again.status_code == 200 and again.json()["id"] == first["id"]
+    other = client.post(f"{API}/evaluate", json={"job_title": "Data Engineer", **ids})
+    assert other.status_code == 503
+
+
+def test_new_callback_is_a_new_request(client, ids):
+    first = _evaluate(client, ids).json()
+    with_hook = _evaluate(client, ids, callback_url="https://hooks.example.com/done").json()
+    assert with_hook["id"] != first["id"]
+    assert "deduplicated" not in with_hook
+
+
+def test_idempotency_key_conflict(client, ids):
+    headers = {"Idempotency-Key": "k-1"}
+    first = client.post(f"{API}/evaluate", json={"job_title": "Backend Engineer", **ids}, headers=headers)
+    again = client.post(f"{API}/evaluate", json={"job_title": "Backend Engineer", **ids}, headers=headers)
+    assert again.json()["id"] == first.json()["id"]
+    other = client.post(f"{API}/evaluate", json={"job_title": "Data Engineer", **ids}, headers=headers)
+    assert other.status_code == 422
+
+
+@pytest.mark.parametrize("url", [
+    "http://169.254.169.254/latest/meta-data",
+    "http://127.0.0.1:8080/hook",
+    "http://10.0.0.5/hook",
+])
+def test_private_callback_is_rejected(client, ids, url):
+    resp = _evaluate(client, ids, callback_url=url)
+    assert resp.status_code == 422
+    assert "not public" in resp.json()["detail"]
+
+
+def test_unknown_upload_is_404(client, ids):
+    resp = _evaluate(client, {**ids, "report_id": "does-not-exist"})
+    assert resp.status_code == 404
+
+
+def test_tampered_cursor_is_400(client):
+    resp = client.get(f"{API}/evaluate/jobs", params={"cursor": "notacursor"})
+    assert resp.status_code == 400
+
+
+def test_unknown_job_is_404(client):
+    assert client.get(f"{API}/evaluate/result/nope").status_code == 404
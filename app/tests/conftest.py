@@ -0,0 +1,85 @@
+"""
+Shared test harness, the same stand-ins app.bench uses: fakeredis (with Lua),
+a throwaway SQLite file, the in-memory retriever, the hashing embedder and the
+fake LLM provider with no latency. Settings are read at import time, so the
+environment is set before any app module is imported.
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q app/tests
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+
+_WORKDIR = tempfile.mkdtemp(prefix="screening-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_WORKDIR, 'test.db')}",
+    "UPLOAD_DIR": os.path.join(_WORKDIR, "uploads"),
+    "GROUND_DIR": os.path.join(_WORKDIR, "ground_truth"),
+    "RETRIEVER_BACKEND": "memory",
+    "RETRIEVER_SNAPSHOT_DIR": os.path.join(_WORKDIR, "index_snapshot"),
+    "LLM_PROVIDER": "fake",
+    "LLM_FAKE_LATENCY_MS": "0",
+    "LLM_FAKE_JITTER_MS": "0",
+    "LLM_RATE_PER_SEC": "0",
+    "LLM_CACHE_ENABLED": "false",
+    "EMBEDDING_WARMUP_ON_STARTUP": "false",
+    "TOKENIZER_MODEL": "approx",
+    "LOG_LEVEL": "WARNING",
+    "WORKER_METRICS_PORT": "0",
+    "QUEUE_MAX_DEPTH": "0",
+    "COMPACTION_INTERVAL": "0",
+    "COMPACTION_BATCH_PAUSE": "0",
+    "PIPELINE_MODE": "staged",
+    "TRIAGE_ENABLED": "false",
+})
+
+import fakeredis  # noqa: E402
+import pytest  # noqa: E402
+from sqlalchemy import delete  # noqa: E402
+
+from app.core import embedding_client, redis_client  # noqa: E402
+from app.core.llm_providers import FakeProvider, set_provider  # noqa: E402
+from app.db.models import Base  # noqa: E402
+from app.db.session import engine, init_db  # noqa: E402
+from app.testing import HashEmbedder  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _stubs():
+    redis_client._r = fakeredis.FakeRedis()
+    embedding_client._model = HashEmbedder()
+    embedding_client._load_seconds = 0.0
+    set_provider(FakeProvider("fake", latency_ms=0, jitter_ms=0))
+    init_db()
+    yield
+    set_provider(None)
+    engine.dispose()
+    shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    yield
+    redis_client._r.flushall()
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(delete(table))
+
+
+@pytest.fixture
+def upload():
+    """Store text as an upload and return its file id."""
+    from app.services.upload_service import register_upload
+    from app.utils.file_io import abs_upload_path, shard_relpath, write_atomic
+
+    def _upload(text: str) -> str:
+        data = text.encode("utf-8")
+        fid = str(uuid.uuid4())
+        relpath = shard_relpath(fid, ".txt")
+        write_atomic(abs_upload_path(relpath), data)
+        return register_upload(fid, relpath, hashlib.sha256(data).hexdigest(), len(data), "doc.txt", "text/plain")
+
+    return _upload
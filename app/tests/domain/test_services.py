@@ -0,0 +1,429 @@
+import base64
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+from sqlalchemy import insert, select, update
+
+from app import worker as worker_mod
+from app.core import redis_client
+from app.core.config import settings
+from app.core.embedding_client import embed_dim
+from app.core.job_queue import JobQueue, QueueFullError
+from app.core.retriever import SNAPSHOT_META, MemoryRetriever, write_snapshot
+from app.db.models import JobArchive, JobResult, JobResultText, UploadAlias, UploadedFile
+from app.db.session import engine
+from app.services import idempotency_service as idem
+from app.services import retention_service
+from app.services import upload_service
+from app.services.job_query_service import InvalidCursorError, list_jobs
+from app.services.pipeline_service import claim_job, create_job, get_job, run_pipeline
+from app.services.upload_service import path_by_id, sha_by_id
+from app.worker import Worker
+
+
+@pytest.fixture
+def queue():
+    client = fakeredis.FakeRedis()
+    yield JobQueue(client, name="test_jobs")
+    client.flushall()
+
+
+def _insert_jobs(rows):
+    with engine.begin() as conn:
+        conn.execute(insert(JobResult), rows)
+
+
+# ---------- queue: lease, ack, reap ----------
+def test_claim_ack(queue):
+    queue.enqueue("j1", {"job_title": "t"})
+    job_id, payload, attempts = queue.claim()
+    assert (job_id, payload, attempts) == ("j1", {"job_title": "t"}, 1)
+    assert queue.stats() == {"pending": 0, "processing": 1, "dead": 0}
+    queue.ack("j1")
+    assert queue.stats() == {"pending": 0, "processing": 0, "dead": 0}
+    assert queue.claim() is None
+
+
+def test_expired_lease_is_requeued_then_dead_lettered(queue, monkeypatch):
+    monkeypatch.setattr(settings, "QUEUE_MAX_ATTEMPTS", 2)
+    queue.enqueue("j1", {"job_title": "t"})
+    assert queue.claim(visibility_timeout=-1)[2] == 1
+    assert queue.reap() == []  # first expiry: back to pending
+    assert queue.stats()["pending"] == 1
+    assert queue.claim(visibility_timeout=-1)[2] == 2
+    assert queue.reap() == [("j1", {"job_title": "t"})]
+    assert queue.stats() == {"pending": 0, "processing": 0, "dead": 1}
+
+
+def test_extend_keeps_lease_alive(queue):
+    queue.enqueue("j1", {})
+    queue.claim(visibility_timeout=1)
+    queue.extend(["j1"], visibility_timeout=60)
+    time.sleep(1.1)
+    assert queue.reap() == []
+    assert queue.stats()["processing"] == 1
+
+
+def test_enqueue_rejects_when_full(queue, monkeypatch):
+    monkeypatch.setattr(settings, "QUEUE_MAX_DEPTH", 1)
+    queue.enqueue("j1", {})
+    with pytest.raises(QueueFullError):
+        queue.enqueue("j2", {})
+    queue.enqueue("j3", {}, force=True)
+    assert queue.depth() == 2
+
+
+# ---------- claim_job compare-and-set ----------
+def test_claim_job_is_exclusive():
+    job_id = create_job("Backend Engineer", "cv", "report")
+    assert claim_job(job_id) is True
+    assert claim_job(job_id) is False
+    assert claim_job("missing") is False
+
+
+def test_claim_job_takes_over_abandoned_processing():
+    job_id = create_job("Backend Engineer", "cv", "report")
+    assert claim_job(job_id)
+    stale = datetime.utcnow() - timedelta(seconds=settings.QUEUE_VISIBILITY_TIMEOUT + 60)
+    with engine.begin() as conn:
+        conn.execute(update(JobResult).where(JobResult.id == job_id).values(updated_at=stale))
+    assert claim_job(job_id) is True
+
+
+def test_claim_job_tolerates_clock_skew_at_lease_expiry():
+    job_id = create_job("Backend Engineer", "cv", "report")
+    assert claim_job(job_id)
+    nearly = datetime.utcnow() - timedelta(seconds=settings.QUEUE_VISIBILITY_TIMEOUT - 2)
+    with engine.begin() as conn:
+        conn.execute(update(JobResult).where(JobResult.id == job_id).values(updated_at=nearly))
+    assert claim_job(job_id) is True
+
+
+def test_claim_job_never_reopens_finished_jobs():
+    job_id = create_job("Backend Engineer", "cv", "report")
+    with engine.begin() as conn:
+        conn.execute(update(JobResult).where(JobResult.id == job_id).values(status="completed"))
+    assert claim_job(job_id) is False
+
+
+def test_run_pipeline_reports_unclaimed_job():
+    job_id = create_job("Backend Engineer", "cv", "report")
+    assert claim_job(job_id)
+    assert run_pipeline(job_id, "Backend Engineer", "cv", "report") is False
+    assert get_job(job_id)["status"] == "processing"
+
+
+# ---------- memory retriever snapshot ----------
+_DOC = {"title": "JD", "text": "Backend engineer, Python and Redis", "doc_type": "job_description"}
+
+
+def _snapshot_meta(path):
+    with open(os.path.join(path, SNAPSHOT_META), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("model, vector", [
+    ("some-other-model", None),
+    (None, [1.0, 0.0]),  # right model name, wrong dimension
+])
+def test_snapshot_for_another_embedder_is_rebuilt(tmp_path, monkeypatch, model, vector):
+    path = str(tmp_path)
+    if model:
+        monkeypatch.setattr(settings, "EMBEDDING_MODEL", model)
+    write_snapshot(path, [_DOC], [vector or [1.0] * embed_dim()], version=1)
+    monkeypatch.undo()
+
+    retriever = MemoryRetriever(path)
+    assert retriever.search_vec([1.0] * embed_dim(), k=1)
+    meta = _snapshot_meta(path)
+    assert (meta["model"], meta["dim"]) == (settings.EMBEDDING_MODEL, embed_dim())
+    assert meta["version"] != 1
+
+
+def test_snapshot_leaves_no_temp_files(tmp_path):
+    write_snapshot(str(tmp_path), [_DOC], [[1.0] * embed_dim()], version=1)
+    write_snapshot(str(tmp_path), [_DOC], [[0.5] * embed_dim()], version=2)
+    assert sorted(os.listdir(tmp_path)) == ["meta.json", "vectors.npy"]
+    assert MemoryRetriever(str(tmp_path)).version() == 2
+
+
+# ---------- idempotency: reserve, commit, release ----------
+def test_reserve_then_duplicate_gets_holder():
+    fp = idem.fingerprint("Backend Engineer", "cv", "report")
+    key = idem.dedup_key(fp)
+    assert idem.reserve(key, "job-1", fp, lambda _: True) is None
+    # still pending: the duplicate is pointed at the first job without consulting reusable
+    assert idem.reserve(key, "job-2", fp, lambda _: pytest.fail("pending holder must be reused")) == "job-1"
+    idem.commit(key, "job-1", fp)
+    assert json.loads(redis_client.get_redis().get(key))["state"] == "ok"
+    assert idem.reserve(key, "job-3", fp, lambda _: True) == "job-1"
+
+
+def test_reserve_takes_over_unusable_holder():
+    fp = idem.fingerprint("Backend Engineer", "cv", "report")
+    key = idem.dedup_key(fp)
+    idem.reserve(key, "job-1", fp, lambda _: True)
+    idem.commit(key, "job-1", fp)
+    assert idem.reserve(key, "job-2", fp, lambda _: False) is None  # e.g. job-1 failed
+    assert json.loads(redis_client.get_redis().get(key))["job"] == "job-2"
+
+
+def test_release_frees_key():
+    fp = idem.fingerprint("Backend Engineer", "cv", "report")
+    key = idem.dedup_key(fp)
+    idem.reserve(key, "job-1", fp, lambda _: True)
+    idem.release(key, "job-1", fp)
+    assert redis_client.get_redis().get(key) is None
+    assert idem.reserve(key, "job-2", fp, lambda _: True) is None
+
+
+def test_idempotency_key_reused_for_other_request():
+    fp = idem.fingerprint("Backend Engineer", "cv", "report")
+    key = idem.dedup_key(fp, "client-key-1")
+    idem.reserve(key, "job-1", fp, lambda _: True, check_fp=True)
+    other = idem.fingerprint("Backend Engineer", "cv", "other-report")
+    with pytest.raises(idem.IdempotencyConflictError):
+        idem.reserve(key, "job-2", other, lambda _: True, check_fp=True)
+
+
+def test_fingerprint_normalises_title_and_includes_callback():
+    fp = idem.fingerprint("Backend  Engineer", "cv", "report")
+    assert fp == idem.fingerprint("backend engineer", "cv", "report")
+    assert fp != idem.fingerprint("backend engineer", "cv", "report", "https://hooks.example.com/a")
+
+
+# ---------- keyset pagination ----------
+@pytest.fixture
+def listed_jobs():
+    base = datetime(2026, 1, 1)
+    rows = [
+        {
+            "id": f"job-{i:03d}",
+            "job_title": "Backend Engineer" if i % 3 else "Data Engineer",
+            "status": "completed" if i % 4 else "failed",
+            "cv_match_rate": None if i % 4 == 0 else round((i % 7) / 10, 1),  # ties on purpose
+            "created_at": base + timedelta(minutes=i // 2),  # ties on purpose
+        }
+        for i in range(60)
+    ]
+    _insert_jobs(rows)
+    return rows
+
+
+def _all_pages(**kwargs):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page = list_jobs(limit=7, cursor=cursor, **kwargs)
+        ids += [r["id"] for r in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+def test_keyset_pages_cover_every_row_once(listed_jobs):
+    ids, pages = _all_pages()
+    expected = sorted(listed_jobs, key=lambda r: (r["created_at"], r["id"]), reverse=True)
+    assert ids == [r["id"] for r in expected]
+    assert pages == 9
+
+
+def test_keyset_score_sort_with_filters(listed_jobs):
+    ids, _ = _all_pages(job_title="Backend Engineer", sort="cv_match_rate", order="asc")
+    expected = sorted(
+        (r for r in listed_jobs if r["job_title"] == "Backend Engineer" and r["cv_match_rate"] is not None),
+        key=lambda r: (r["cv_match_rate"], r["id"]),
+    )
+    assert ids == [r["id"] for r in expected]
+
+
+def test_rows_inserted_meanwhile_do_not_shift_pages(listed_jobs):
+    first = list_jobs(limit=10)
+    _insert_jobs([{"id": "job-new", "job_title": "x", "status": "queued", "created_at": datetime(2027, 1, 1)}])
+    second = list_jobs(limit=10, cursor=first["next_cursor"])
+    expected = sorted(listed_jobs, key=lambda r: (r["created_at"], r["id"]), reverse=True)
+    assert [r["id"] for r in second["items"]] == [r["id"] for r in expected[10:20]]
+
+
+@pytest.mark.parametrize("sort, cursor_payload", [
+    ("created_at", ["created_at", "notadate", "job-001"]),
+    ("cv_match_rate", ["cv_match_rate", "high", "job-001"]),
+    ("cv_match_rate", ["cv_match_rate", 0.5, 7]),
+    ("created_at", ["cv_match_rate", 0.5, "job-001"]),
+])
+def test_tampered_cursor_is_rejected(sort, cursor_payload):
+    cursor = base64.urlsafe_b64encode(json.dumps(cursor_payload).encode()).decode()
+    with pytest.raises(InvalidCursorError):
+        list_jobs(sort=sort, cursor=cursor)
+    with pytest.raises(InvalidCursorError):
+        list_jobs(sort=sort, cursor="not base64 json")
+
+
+# ---------- retention and archival ----------
+def _finished_job(job_id, days_old, inline=False):
+    created = datetime.utcnow() - timedelta(days=days_old)
+    texts = {"cv_feedback": f"cv {job_id}", "project_feedback": f"proj {job_id}", "overall_summary": f"sum {job_id}"}
+    _insert_jobs([{
+        "id": job_id, "job_title": "Backend Engineer", "status": "completed", "cv_id": "cv", "report_id": "rep",
+        "cv_match_rate": 0.8, "project_score": 4.0, "created_at": created, **(texts if inline else {}),
+    }])
+    if not inline:
+        with engine.begin() as conn:
+            conn.execute(insert(JobResultText).values(job_id=job_id, **texts))
+
+
+def test_move_inline_texts():
+    _finished_job("legacy", 1, inline=True)
+    before = get_job("legacy")
+    assert retention_service.move_inline_texts(batch_size=1) == 1
+    with engine.connect() as conn:
+        assert conn.execute(select(JobResult.cv_feedback).where(JobResult.id == "legacy")).scalar() is None
+        assert conn.execute(select(JobResultText.cv_feedback)).scalar() == "cv legacy"
+    assert get_job("legacy") == before
+
+
+def test_archive_old_finished_jobs():
+    _finished_job("old-1", 120)
+    _finished_job("old-2", 100)
+    _finished_job("recent", 10)
+    running = create_job("Backend Engineer", "cv", "rep")
+    with engine.begin() as conn:
+        conn.execute(update(JobResult).where(JobResult.id == running)
+                     .values(created_at=datetime.utcnow() - timedelta(days=200)))
+    before = get_job("old-1")
+
+    assert retention_service.archive_jobs(days=90, batch_size=1) == 2
+
+    with engine.connect() as conn:
+        hot = set(conn.execute(select(JobResult.id)).scalars())
+        texts = set(conn.execute(select(JobResultText.job_id)).scalars())
+        payload = conn.execute(select(JobArchive.payload).where(JobArchive.id == "old-1")).scalar()
+    assert hot == {"recent", running}
+    assert texts == {"recent"}
+    assert json.loads(zlib.decompress(payload))["overall_summary"] == "sum old-1"
+    assert get_job("old-1") == before  # served from the archive
+
+
+def test_purge_archive():
+    _finished_job("old", 120)
+    retention_service.archive_jobs(days=90)
+    with engine.begin() as conn:
+        conn.execute(update(JobArchive).values(archived_at=datetime.utcnow() - timedelta(days=400)))
+    assert retention_service.purge_archive(days=365) == 1
+    assert get_job("old") == {}
+
+
+def test_expire_uploads_keeps_referenced_and_recent(upload):
+    unused, referenced, fresh = upload("unused cv"), upload("referenced cv"), upload("fresh cv")
+    create_job("Backend Engineer", referenced, fresh)
+    old = datetime.utcnow() - timedelta(days=40)
+    with engine.begin() as conn:
+        conn.execute(update(UploadedFile).where(UploadedFile.id.in_([unused, referenced])).values(created_at=old))
+    for fid in (unused, referenced):
+        os.utime(path_by_id(fid), (old.timestamp(), old.timestamp()))
+    unused_path = path_by_id(unused)
+
+    assert retention_service.expire_uploads(days=30) == 1
+
+    assert not os.path.exists(unused_path)
+    with pytest.raises(FileNotFoundError):
+        path_by_id(unused)  # no stale lookup cache
+    assert os.path.exists(path_by_id(referenced))
+    assert os.path.exists(path_by_id(fresh))
+
+
+# ---------- legacy flat-layout uploads ----------
+def _legacy_file(name, data):
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(settings.UPLOAD_DIR, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_legacy_upload_with_any_extension_is_adopted():
+    path = _legacy_file("legacy-rtf.rtf", b"{\\rtf1 Backend engineer}")
+    assert path_by_id("legacy-rtf") == path
+    with engine.connect() as conn:
+        assert conn.execute(select(UploadedFile.path).where(UploadedFile.id == "legacy-rtf")).scalar() == "legacy-rtf.rtf"
+    with pytest.raises(FileNotFoundError):
+        path_by_id("legacy")  # a prefix is not a match
+
+
+def test_legacy_duplicate_becomes_alias(upload, monkeypatch):
+    fid = upload("the same cv bytes")
+    _legacy_file("legacy-dup.txt", b"the same cv bytes")
+    assert sha_by_id("legacy-dup") == sha_by_id(fid)
+    with engine.connect() as conn:
+        assert conn.execute(select(UploadAlias.upload_id).where(UploadAlias.id == "legacy-dup")).scalar() == fid
+
+    monkeypatch.setattr(upload_service, "sha256_file", lambda path: pytest.fail("alias lookup re-hashed the file"))
+    assert path_by_id("legacy-dup") == path_by_id(fid)
+
+    # a job that names the alias keeps the upload it points to
+    create_job("Backend Engineer", "legacy-dup", "legacy-dup")
+    old = datetime.utcnow() - timedelta(days=40)
+    with engine.begin() as conn:
+        conn.execute(update(UploadedFile).where(UploadedFile.id == fid).values(created_at=old))
+    os.utime(path_by_id(fid), (old.timestamp(), old.timestamp()))
+    assert retention_service.expire_uploads(days=30) == 0
+
+
+# ---------- worker completion side effects ----------
+def _drain(queue, done=None, timeout=10.0):
+    done = done or (lambda: not sum(queue.stats().values()))
+    w = Worker(queue, concurrency=1)
+    t = threading.Thread(target=w._loop, daemon=True)
+    t.start()
+    deadline = time.monotonic() + timeout
+    while not done() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    w.stop.set()
+    t.join(timeout)  # the loop finishes the job in hand before it stops
+
+
+@pytest.fixture
+def side_effects(monkeypatch):
+    calls = []
+    monkeypatch.setattr(worker_mod, "release_next", lambda batch_id: calls.append(("release", batch_id)))
+    monkeypatch.setattr(worker_mod, "deliver_async", lambda url, body: calls.append(("webhook", body["status"])))
+    return calls
+
+
+def test_worker_runs_side_effects_once_per_finished_job(queue, upload, side_effects):
+    cv_id, report_id = upload("Backend engineer with Python and Redis. " * 5), upload("FastAPI queue report. " * 5)
+    job_id = create_job("Backend Engineer", cv_id, report_id)
+    queue.enqueue(job_id, {"job_title": "Backend Engineer", "cv_id": cv_id, "report_id": report_id,
+                           "batch_id": "b1", "callback_url": "https://hooks.example.com/x"})
+    _drain(queue)
+    assert get_job(job_id)["status"] == "completed"
+    assert side_effects == [("release", "b1"), ("webhook", "completed")]
+
+
+def test_worker_leaves_lease_of_job_held_elsewhere(queue, side_effects):
+    job_id = create_job("Backend Engineer", "cv", "report")
+    assert claim_job(job_id)  # another worker holds it
+    queue.enqueue(job_id, {"job_title": "Backend Engineer", "cv_id": "cv", "report_id": "report",
+                           "batch_id": "b1", "callback_url": "https://hooks.example.com/x"})
+    _drain(queue, done=lambda: not queue.stats()["pending"])
+    assert side_effects == []
+    assert get_job(job_id)["status"] == "processing"
+    # not acked: if the holder is gone, the lease lapses and the reaper retries it
+    assert queue.stats() == {"pending": 0, "processing": 1, "dead": 0}
+
+
+def test_worker_drops_duplicate_of_finished_job(queue, side_effects):
+    job_id = create_job("Backend Engineer", "cv", "report")
+    with engine.begin() as conn:
+        conn.execute(update(JobResult).where(JobResult.id == job_id).values(status="completed"))
+    queue.enqueue(job_id, {"job_title": "Backend Engineer", "cv_id": "cv", "report_id": "report",
+                           "batch_id": "b1", "callback_url": "https://hooks.example.com/x"})
+    _drain(queue)
+    assert side_effects == []
+    assert queue.stats() == {"pending": 0, "processing": 0, "dead": 0}
@@ -1,30 +1,69 @@
 import os
 import uuid
+import hashlib
+import threading
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 from app.core.config import settings
+from app.core.metrics import span
+
+TEXT_DIR = ".text"
+
+# top-level listing of UPLOAD_DIR: (directory mtime_ns, {file id: file name})
+_legacy_index: Tuple[int, Dict[str, str]] = (-1, {})
+_legacy_lock = threading.Lock()
 
 def _ensure_upload_dir() -> str:
     Path(settings.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
     return settings.UPLOAD_DIR
 
-def save_upload_bytes(filename: str, data: bytes) -> str:
-    _ensure_upload_dir()
-    fid = str(uuid.uuid4())
-    _, ext = os.path.splitext(filename or "")
-    ext = ext or ".txt"
-    path = os.path.join(settings.UPLOAD_DIR, f"{fid}{ext}")
-    with open(path, "wb") as f:
-        f.write(data)
-    return fid
+def shard_relpath(fid: str, ext: str) -> str:
+    """uploads live in UPLOAD_DIR/ab/cd/<fid><ext> so no directory grows unbounded"""
+    key = fid.replace("-", "")
+    return os.path.join(key[:2], key[2:4], f"{fid}{ext}")
 
-def path_by_id(fid: str) -> str:
+def abs_upload_path(relpath: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, relpath)
+
+def legacy_relpath(fid: str) -> Optional[str]:
+    """
+    flat-layout uploads from before sharding, whatever their extension. Nothing
+    new is written to the top level but shard directories, so its listing is
+    indexed once and re-read only when the directory's mtime moves.
+    """
+    global _legacy_index
     base = _ensure_upload_dir()
-    for name in os.listdir(base):
-        if name.startswith(fid):
-            return os.path.join(base, name)
-    raise FileNotFoundError(f"file id not found: {fid}")
+    mtime = os.stat(base).st_mtime_ns
+    with _legacy_lock:
+        if _legacy_index[0] != mtime:
+            names: Dict[str, str] = {}
+            with os.scandir(base) as it:
+                for entry in sorted(it, key=lambda e: e.name):
+                    stem, ext = os.path.splitext(entry.name)
+                    if ext and not entry.name.startswith(".") and entry.is_file():
+                        names.setdefault(stem, entry.name)
+            _legacy_index = (mtime, names)
+        return _legacy_index[1].get(fid)
+
+def write_atomic(path: str, data: bytes) -> None:
+    Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def sha256_file(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
 
 def read_file_text(path: str) -> str:
+    with span("file_parse"):
+        return _read_file_text(path)
+
+def _read_file_text(path: str) -> str:
     lower = path.lower()
     if lower.endswith(".pdf"):
         try:
@@ -43,6 +82,23 @@ def read_file_text(path: str) -> str:
             data = f.read(2048)
         return f"(binary file {os.path.basename(path)}; first 2KB) {repr(data[:200])}"
 
+def read_text_cached(path: str, sha: str) -> str:
+    """
+    Extracted text for a file, parsed at most once per distinct content.
+    Parse errors are returned but not cached so a later attempt can retry.
+    """
+    cache_path = os.path.join(settings.UPLOAD_DIR, TEXT_DIR, sha[:2], f"{sha}.txt")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    text = read_file_text(path)
+    if not text.startswith("(pdf parse error"):
+        write_atomic(cache_path, text.encode("utf-8"))
+    return text
+
 def join_ctx(rows: list[dict]) -> str:
     if not rows:
         return ""
@@ -0,0 +1,113 @@
+import re
+from typing import List, Tuple
+
+_PARA_SPLIT = re.compile(r"\n\s*\n")
+
+
+def chunk_text(text: str, max_chars: int = 1200, overlap: int = 150) -> List[str]:
+    """
+    Split text into chunks of at most max_chars, preferring paragraph then
+    sentence/whitespace boundaries. Consecutive chunks share up to `overlap`
+    trailing characters so a fact straddling a boundary is retrievable.
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    if len(text) <= max_chars:
+        return [text]
+
+    pieces: List[str] = []
+    for para in _PARA_SPLIT.split(text):
+        para = para.strip()
+        while len(para) > max_chars:
+            cut = max(para.rfind(". ", 0, max_chars), para.rfind("\n", 0, max_chars))
+            if cut < max_chars // 2:
+                cut = para.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(para[: cut + 1].strip())
+            para = para[cut + 1:].strip()
+        if para:
+            pieces.append(para)
+
+    chunks: List[str] = []
+    cur = ""
+    for piece in pieces:
+        if cur and len(cur) + 2 + len(piece) > max_chars:
+            chunks.append(cur)
+            tail = cur[-overlap:] if overlap > 0 else ""
+            if tail and " " in tail:
+                tail = tail[tail.index(" ") + 1:]
+            cur = f"{tail}\n\n{piece}" if tail and len(tail) + 2 + len(piece) <= max_chars else piece
+        else:
+            cur = f"{cur}\n\n{piece}" if cur else piece
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+_MD_HEADING = re.compile(r"^#{1,6}\s+\S")
+
+# section titles seen in CVs and project reports; any other line is body text,
+# however it is capitalised ("PYTHON, SQL, DOCKER" under SKILLS is content)
+SECTION_NAMES = frozenset({
+    "summary", "professional summary", "profile", "about", "about me", "objective", "career objective",
+    "experience", "work experience", "professional experience", "employment", "employment history",
+    "work history", "education", "skills", "technical skills", "core skills", "key skills",
+    "projects", "personal projects", "certifications", "certificates", "awards", "achievements",
+    "publications", "languages", "interests", "hobbies", "references", "contact", "volunteering",
+    "volunteer experience", "courses", "training", "leadership", "activities",
+    "introduction", "overview", "background", "problem statement", "requirements", "approach",
+    "methodology", "architecture", "system design", "design", "design choices", "implementation",
+    "results", "evaluation", "testing", "error handling", "resilience", "deployment", "setup",
+    "challenges", "trade-offs", "tradeoffs", "limitations", "future work", "future improvements",
+    "conclusion", "conclusions", "appendix",
+})
+
+
+def _heading(line: str) -> str:
+    """the heading title if `line` is a markdown heading or a known section name, else an empty string"""
+    if _MD_HEADING.match(line):
+        return line.lstrip("#").strip()
+    title = line.strip("*_ ").rstrip(":").strip()
+    return title if " ".join(title.lower().split()) in SECTION_NAMES else ""
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """
+    Split a CV/report into (heading, body) pairs. Headings are markdown
+    headings or lines that are just a known section name (SECTION_NAMES,
+    any case, optional trailing colon); text before the first heading gets
+    an empty heading. A heading with no body of its own is merged into the
+    next one ("Experience / Projects") rather than dropped.
+    """
+    sections: List[Tuple[str, str]] = []
+    heading, body = "", []
+    for line in (text or "").splitlines():
+        title = _heading(line.strip())
+        if not title:
+            body.append(line)
+            continue
+        if any(b.strip() for b in body):
+            sections.append((heading, "\n".join(body).strip()))
+            heading = title
+        else:
+            heading = f"{heading} / {title}" if heading else title
+        body = []
+    if any(b.strip() for b in body):
+        sections.append((heading, "\n".join(body).strip()))
+    return sections
+
+
+def chunk_sections(text: str, max_chars: int = 1200, overlap: int = 150) -> List[str]:
+    """chunk_text per section, each chunk prefixed with its section heading"""
+    out: List[str] = []
+    for heading, body in split_sections(text):
+        for chunk in chunk_text(body, max_chars, overlap):
+            out.append(f"[{heading}]\n{chunk}" if heading else chunk)
+    return out
+
+
+def approx_tokens(text: str) -> int:
+    """cheap token estimate (~4 chars/token for English prose)"""
+    return (len(text) + 3) // 4
@@ -0,0 +1,216 @@
+import os
+import signal
+import threading
+import time
+from typing import Set
+
+from app.core.config import settings
+from app.core.embedding_client import get_embedder
+from app.core.job_queue import JobQueue, get_queue
+from app.core.metrics import JOBS_INFLIGHT, register_default_stats
+from app.db.session import engine, init_db
+from app.services.batch_service import release_next
+from app.services.pipeline_service import ACTIVE_STATUSES, fail_job, get_job, run_pipeline
+from app.services.retention_service import compact_if_due
+from app.services.search_service import warm_up
+from app.services.webhook_service import deliver_async
+from app.utils.logger import configure_logging, get_logger, job_context
+
+log = get_logger(__name__)
+
+
+class Worker:
+    """
+    Pulls evaluation jobs from the Redis queue and runs them on a fixed pool of
+    threads. A maintenance thread keeps leases of in-flight jobs alive and
+    re-queues jobs whose worker died (expired leases).
+    """
+
+    def __init__(self, queue: JobQueue, concurrency: int = settings.WORKER_CONCURRENCY):
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.stop = threading.Event()
+        self._inflight: Set[str] = set()
+        self._lock = threading.Lock()
+
+    # ---------- job loop ----------
+    def _loop(self) -> None:
+        while not self.stop.is_set():
+            try:
+                claimed = self.queue.claim()
+            except Exception as e:
+                log.warning("claim failed: %s", e)
+                self.stop.wait(settings.QUEUE_POLL_INTERVAL * 4)
+                continue
+            if not claimed:
+                self.stop.wait(settings.QUEUE_POLL_INTERVAL)
+                continue
+
+            job_id, payload, attempts = claimed
+            with self._lock:
+                self._inflight.add(job_id)
+            JOBS_INFLIGHT.inc()
+            ran = True
+            try:
+                with job_context(job_id):
+                    log.info("job claimed", extra={"attempt": attempts})
+                    ran = run_pipeline(
+                        job_id,
+                        payload["job_title"],
+                        payload["cv_id"],
+                        payload["report_id"],
+                        use_cache=payload.get("use_cache", True),
+                        batch_id=payload.get("batch_id"),
+                    )
+            except Exception as e:
+                log.exception("job crashed", extra={"job_id": job_id})
+                fail_job(job_id, str(e))
+            finally:
+                JOBS_INFLIGHT.dec()
+                with self._lock:
+                    self._inflight.discard(job_id)
+                # a duplicate delivery of a job another worker is running (or already
+                # finished) must not release a batch slot or fire the webhook again
+                if ran:
+                    self.queue.ack(job_id)
+                    self._on_done(job_id, payload)
+                else:
+                    self._skip(job_id)
+
+    def _skip(self, job_id: str) -> None:
+        # The claim failed. A finished job's entry is dropped. One still in
+        # processing keeps its entry: the worker running it acks it, and if that
+        # worker is gone (or the stale check lost to clock skew) the lease lapses
+        # and the reaper hands the job out again.
+        try:
+            active = get_job(job_id).get("status") in ACTIVE_STATUSES
+        except Exception as e:
+            log.warning("job status lookup failed: %s", e, extra={"job_id": job_id})
+            return
+        if active:
+            log.info("job held by another worker; leaving the lease to lapse", extra={"job_id": job_id})
+        else:
+            self.queue.ack(job_id)
+            log.info("job already finished; skipped", extra={"job_id": job_id})
+
+    def _on_done(self, job_id: str, payload: dict) -> None:
+        # a retried batch job already released its successor the first time round
+        if payload.get("batch_id") and not payload.get("retry"):
+            try:
+                release_next(payload["batch_id"])
+            except Exception as e:
+                log.warning("batch release failed: %s", e, extra={"job_id": job_id})
+        if payload.get("callback_url"):
+            try:
+                deliver_async(payload["callback_url"], get_job(job_id))
+            except Exception as e:
+                log.warning("webhook scheduling failed: %s", e, extra={"job_id": job_id})
+
+    # ---------- leases ----------
+    def _maintain(self) -> None:
+        interval = max(1.0, settings.QUEUE_VISIBILITY_TIMEOUT / 3)
+        while not self.stop.wait(interval):
+            try:
+                with self._lock:
+                    inflight = list(self._inflight)
+                self.queue.extend(inflight)
+                for job_id, payload in self.queue.reap():
+                    fail_job(job_id, f"gave up after {settings.QUEUE_MAX_ATTEMPTS} attempts")
+                    self._on_done(job_id, payload)
+            except Exception as e:
+                log.warning("lease maintenance failed: %s", e)
+
+    # ---------- retention ----------
+    def _compact(self) -> None:
+        # every worker checks; the Redis lock in compact_if_due lets one of them run per interval
+        interval = max(1, min(60, settings.COMPACTION_INTERVAL))
+        while not self.stop.wait(interval):
+            try:
+                compact_if_due()
+            except Exception as e:
+                log.warning("compaction failed: %s", e)
+
+    def run(self) -> None:
+        loops = [
+            threading.Thread(target=self._loop, name=f"worker-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        threads = [threading.Thread(target=self._maintain, name="lease-maintainer", daemon=True), *loops]
+        if settings.COMPACTION_INTERVAL > 0:
+            threads.append(threading.Thread(target=self._compact, name="compaction", daemon=True))
+        for t in threads:
+            t.start()
+        log.info("worker consuming '%s' with concurrency=%d", self.queue.name, self.concurrency)
+        while not self.stop.is_set():
+            time.sleep(0.5)
+        # compaction is batched and resumable, so it is not waited for
+        for t in loops:
+            t.join()
+        log.info("worker stopped")
+
+
+def _start_metrics_server(index: int = 0) -> None:
+    if not settings.WORKER_METRICS_PORT:
+        return
+    from prometheus_client import start_http_server
+
+    port = settings.WORKER_METRICS_PORT + index
+    register_default_stats()
+    start_http_server(port)
+    log.info("worker metrics on :%d/metrics", port)
+
+
+def _run_worker(index: int = 0) -> None:
+    _start_metrics_server(index)
+    warm_up()
+    worker = Worker(get_queue())
+
+    def _shutdown(signum, frame):
+        worker.stop.set()
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+    worker.run()
+
+
+def _run_forked(n: int) -> None:
+    """
+    Load the embedding weights once, then fork n workers. The children share
+    the parent's weight pages copy-on-write instead of each loading a copy.
+    """
+    get_embedder()
+    engine.dispose()  # never share pooled DB sockets across fork
+    children = []
+    for i in range(n):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(i)
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def _forward(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _forward)
+    signal.signal(signal.SIGTERM, _forward)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+def main() -> None:
+    configure_logging()
+    init_db()
+    if settings.WORKER_PROCESSES > 1 and hasattr(os, "fork"):
+        _run_forked(settings.WORKER_PROCESSES)
+    else:
+        _run_worker()
+
+
+if __name__ == "__main__":
+    main()